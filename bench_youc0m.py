@@ -0,0 +1,720 @@
+"""
+Benchmarks for nice_youc0m.py against a local stand-in for you.com's
+streamingSearch endpoint. Every result is printed as one JSON line.
+
+    python bench_youc0m.py pool --requests 200
+    python bench_youc0m.py startup --runs 20
+    python bench_youc0m.py complete --entries 100000
+    python bench_youc0m.py pages --pages 5
+    python bench_youc0m.py coalesce --concurrency 16
+    python bench_youc0m.py context --entries 10000
+    python bench_youc0m.py sse --tokens 5000
+    python bench_youc0m.py answer --error-rate 0.1
+    python bench_youc0m.py resilience --requests 200
+    python bench_youc0m.py format
+    python bench_youc0m.py history --sizes 10000,100000,1000000
+    python bench_youc0m.py export --entries 100000
+    python bench_youc0m.py archive --sizes 1000000
+    python bench_youc0m.py all --output runs.jsonl --label baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from nice_youc0m import ChatContext, CommandSystem, History, HistoryArchive, HTTPClient, Metrics, MultiPageFetcher, PromptIndex, ResiliencePolicy, ResultFormatter, SingleFlight, SSEParser, YOU, iter_sse_events
+
+def build_events(tokens=50, token_text="lorem ", sources=0, page=1):
+    """Build the SSE events of a fake answer made of `tokens` chat tokens"""
+    events = []
+    if sources:
+        # Every page repeats half of the previous page's sources
+        results = [
+            {"url": f"https://example.com/{index}", "name": f"Result {index}", "snippet": "lorem ipsum"}
+            for index in range((page - 1) * sources // 2, (page - 1) * sources // 2 + sources)
+        ]
+        payload = json.dumps({"youChatSerpResults": results})
+        events.append(f"event: searchResults\ndata: {payload}\n\n".encode("utf-8"))
+    for _ in range(tokens):
+        payload = json.dumps({"youChatToken": token_text})
+        events.append(f"event: youChatToken\ndata: {payload}\n\n".encode("utf-8"))
+    events.append(b"event: done\ndata: I'm done\n\n")
+    return events
+
+class FakeYouHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        page = int(query.get("page", ["1"])[0])
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        events = server.events if not server.sources else build_events(server.tokens, sources=server.sources, page=page)
+        # A client resuming with Last-Event-ID gets the events after that one
+        resumed = self.headers.get("Last-Event-ID")
+        first = int(resumed) + 1 if resumed and resumed.isdigit() else 0
+
+        with server.lock:
+            stall = server.stall and server.rng.random() < server.stall_rate
+            failed = server.error_rate and server.rng.random() < server.error_rate
+        if stall:
+            time.sleep(server.stall)
+        if failed:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index in range(first, len(events)):
+            event = b"id: %d\n%s" % (index, events[index]) if server.ids else events[index]
+            if index == server.stall_after:
+                time.sleep(server.hang)
+            if index == server.reset_after and resumed is None:
+                # Abrupt close in the middle of the chunked body
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)
+                return
+            if server.token_delay:
+                time.sleep(server.token_delay)
+            # Slow-loris: the event trickles in as many tiny chunks
+            pieces = [event[i:i + server.drip] for i in range(0, len(event), server.drip)] if server.drip else [event]
+            for piece in pieces:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                self.wfile.flush()
+                if server.drip_delay:
+                    time.sleep(server.drip_delay)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeYouServer(ThreadingHTTPServer):
+    """
+    Local streamingSearch stand-in running in a background thread. Answers
+    can be paced per token, fail with a 500 at error_rate, stall `stall`
+    seconds before the headers at stall_rate, drip out `drip` bytes at a time
+    every drip_delay seconds, hang `hang` seconds before event stall_after or
+    be cut before event reset_after. With ids, events carry an id and
+    Last-Event-ID is honored.
+    """
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing pooled keep-alive connections are expected
+        if not issubclass(sys.exc_info()[0], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def __init__(self, tokens=50, token_delay=0.0, sources=0, error_rate=0.0, stall=0.0, drip=0, drip_delay=0.0, seed=0,
+                 stall_rate=1.0, stall_after=None, hang=0.0, reset_after=None, ids=False):
+        super().__init__(("127.0.0.1", 0), FakeYouHandler)
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.sources = sources
+        self.error_rate = error_rate
+        self.stall = stall
+        self.stall_rate = stall_rate
+        self.stall_after = stall_after
+        self.hang = hang
+        self.reset_after = reset_after
+        self.ids = ids
+        self.drip = drip
+        self.drip_delay = drip_delay
+        self.rng = random.Random(seed)
+        self.events = build_events(tokens)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def api_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/streamingSearch"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+def summarize(name, samples, **extra):
+    samples = sorted(samples)
+    result = {
+        "bench": name,
+        "n": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+    result.update(extra)
+    return result
+
+def timed_answer(you):
+    start = time.perf_counter()
+    for _ in you.StreamAnswer():
+        pass
+    if you.error:
+        raise RuntimeError(you.error)
+    return time.perf_counter() - start
+
+def bench_pool(args):
+    """Per-request latency with a shared pooled client versus a new client per request"""
+    with FakeYouServer(tokens=args.tokens) as server:
+        shared = HTTPClient()
+        reused = [timed_answer(YOU("bench", client=shared, api_url=server.api_url)) for _ in range(args.requests)]
+        shared.close()
+
+        fresh = []
+        for _ in range(args.requests):
+            client = HTTPClient()
+            fresh.append(timed_answer(YOU("bench", client=client, api_url=server.api_url)))
+            client.close()
+
+    yield summarize("pool_reused", reused, tokens=args.tokens)
+    yield summarize("pool_fresh", fresh, tokens=args.tokens)
+
+def isolated_home(**config):
+    """Temporary HOME holding a nice_youc0m config.json with the given keys"""
+    home = tempfile.TemporaryDirectory()
+    config_dir = os.path.join(home.name, ".nice_youc0m")
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "config.json"), "w") as f:
+        json.dump(config, f)
+    return home
+
+def parse_importtime(stderr):
+    """Cumulative import time in ms per top level module from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  ") and cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1000
+    return modules
+
+def bench_startup(args):
+    """Wall time of a one-shot `-q -p` invocation, of a --client call to a daemon and of a bare interpreter"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(here, "nice_youc0m.py")
+    with FakeYouServer(tokens=args.tokens) as server:
+        home = isolated_home(api_url=server.api_url, cache_enabled=False)
+        env = dict(os.environ, HOME=home.name)
+        commands = {
+            "startup_bare_python": [sys.executable, "-c", "pass"],
+            "startup_prompt": [sys.executable, script, "-q", "-p", "bench"],
+            # Run as a module the cached bytecode is used, a script is compiled every time
+            "startup_prompt_module": [sys.executable, "-m", "nice_youc0m", "-q", "-p", "bench"],
+        }
+        for name, command in commands.items():
+            samples = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                subprocess.run(command, env=env, cwd=here, stdout=subprocess.DEVNULL, check=True)
+                samples.append(time.perf_counter() - start)
+            yield summarize(name, samples)
+
+        # The same prompt forwarded to a warm daemon
+        daemon = subprocess.Popen([sys.executable, script, "--daemon"], env=env, stderr=subprocess.DEVNULL)
+        socket_path = os.path.join(home.name, ".nice_youc0m", "daemon.sock")
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, script, "--client", "-p", "bench"], env=env, stdout=subprocess.DEVNULL, check=True)
+            samples.append(time.perf_counter() - start)
+        subprocess.run([sys.executable, script, "--stop-daemon"], env=env, check=True)
+        daemon.wait()
+        yield summarize("startup_client", samples)
+
+        profile = subprocess.run(
+            [sys.executable, "-X", "importtime", script, "-q", "-p", "bench"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+        )
+        modules = parse_importtime(profile.stderr)
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10]
+        yield {"bench": "startup_imports", "imports_ms": dict(slowest)}
+        home.cleanup()
+
+WORDS = ("how", "what", "why", "python", "rust", "install", "error", "list", "sort", "dict",
+         "async", "http", "json", "parse", "file", "thread", "regex", "docker", "git", "sql")
+
+def synthetic_prompts(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) for _ in range(n)]
+
+def bench_complete(args):
+    """Per-keystroke completion latency over a large history"""
+    prompts = synthetic_prompts(args.entries)
+    start = time.perf_counter()
+    index = PromptIndex(prompts)
+    build = time.perf_counter() - start
+
+    rng = random.Random(1)
+    for mode in ("prefix", "substring", "fuzzy"):
+        samples = []
+        for _ in range(args.requests):
+            prompt = rng.choice(prompts)
+            text = prompt[:rng.randint(1, 12)] if mode == "prefix" else rng.choice(WORDS)
+            start = time.perf_counter()
+            index.complete(text, mode)
+            samples.append(time.perf_counter() - start)
+        yield summarize(f"complete_{mode}", samples, entries=args.entries, unique=len(index.stats), build_s=build)
+
+    samples = []
+    for prompt in synthetic_prompts(args.requests, seed=2):
+        start = time.perf_counter()
+        index.add(prompt)
+        samples.append(time.perf_counter() - start)
+    yield summarize("complete_add", samples, entries=args.entries)
+
+def bench_pages(args):
+    """Wall time of N result pages fetched one after another versus concurrently"""
+    with FakeYouServer(tokens=args.tokens, token_delay=0.002, sources=10) as server:
+        client = HTTPClient(pool_maxsize=args.pages)
+        sequential, concurrent = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            for page in range(1, args.pages + 1):
+                timed_answer(YOU("bench", page, client=client, api_url=server.api_url))
+            sequential.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            MultiPageFetcher("bench", args.pages, client=client, api_url=server.api_url).fetch()
+            concurrent.append(time.perf_counter() - start)
+        client.close()
+
+    yield summarize("pages_sequential", sequential, pages=args.pages)
+    yield summarize("pages_concurrent", concurrent, pages=args.pages)
+
+def bench_coalesce(args):
+    """A burst of identical prompts with and without single-flight coalescing"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    for coalesce in (False, True):
+        with FakeYouServer(tokens=args.tokens, token_delay=args.token_delay) as server:
+            client = HTTPClient(pool_maxsize=args.concurrency)
+            flights = SingleFlight() if coalesce else None
+            samples = []
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    yous = [YOU("bench", client=client, api_url=server.api_url, flights=flights) for _ in range(args.concurrency)]
+                    list(executor.map(timed_answer, yous))
+                    samples.append(time.perf_counter() - start)
+            client.close()
+        yield summarize("coalesce_on" if coalesce else "coalesce_off", samples,
+                        burst=args.concurrency, upstream_requests=server.requests)
+
+def bench_context(args):
+    """Per-turn cost and request size of the chat context over a long session"""
+    context = ChatContext()
+    prompts = synthetic_prompts(args.entries)
+    answer = " ".join(WORDS) * 10
+    samples, sizes = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        url = YOU(prompt, chat=context.encoded())._api_url()
+        context.add({"prompt": prompt, "response": answer})
+        samples.append(time.perf_counter() - start)
+        sizes.append(len(url))
+    window = max(1, len(prompts) // 10)
+    yield summarize("context_first_turns", samples[:window], turns=window, max_url_bytes=max(sizes[:window]))
+    yield summarize("context_last_turns", samples[-window:], turns=window, max_url_bytes=max(sizes[-window:]))
+
+def sse_stream(tokens, chunk_size):
+    """The SSE body of a fake answer cut into network-sized chunks"""
+    body = b"".join(build_events(tokens))
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+def legacy_split_answer(body):
+    """The original parser: split the whole response, then every event and line"""
+    paragraph = ""
+    for event in body.decode("utf-8").strip().split("\n\n"):
+        if not event:
+            continue
+        event_type = None
+        event_data = None
+        for line in event.split("\n"):
+            if line.startswith("event:"):
+                event_type = line.split("event:")[1].strip()
+            elif line.startswith("data:"):
+                event_data = line.split("data:")[1].strip()
+        if event_type == "youChatToken" and event_data:
+            paragraph += json.loads(event_data)["youChatToken"]
+        elif event_type == "done":
+            break
+    return paragraph
+
+def legacy_incremental_events(chunks):
+    """The previous incremental parser: split on blank lines, decode and split each event"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        while True:
+            end = buffer.find(b"\n\n")
+            if end == -1:
+                break
+            event = buffer[:end].decode("utf-8", errors="replace")
+            del buffer[:end + 2]
+            event_type = event_data = None
+            for line in event.split("\n"):
+                if line.startswith("event:"):
+                    event_type = line.split("event:")[1].strip()
+                elif line.startswith("data:"):
+                    event_data = line.split("data:")[1].strip()
+            yield event_type, event_data
+
+def collect_answer(events):
+    tokens = []
+    for event_type, event_data in events:
+        if event_type == "youChatToken":
+            tokens.append(json.loads(event_data)["youChatToken"])
+        elif event_type == "done":
+            break
+    return "".join(tokens)
+
+def bench_sse(args):
+    """SSE parsing throughput of SSEParser against the previous approaches"""
+    body = b"".join(build_events(args.tokens))
+    parsers = {
+        "legacy_split": lambda chunks: legacy_split_answer(body),
+        "legacy_incremental": lambda chunks: collect_answer(legacy_incremental_events(chunks)),
+        "parser_chunked": lambda chunks: collect_answer(iter_sse_events(chunks)),
+        "parser_buffered": lambda chunks: collect_answer(SSEParser.parse(body)),
+    }
+    expected = legacy_split_answer(body)
+    # CR and CRLF line endings, fed as memoryviews split at every possible place
+    for newline in (b"\r\n", b"\r"):
+        view = memoryview(body.replace(b"\n", newline))
+        for chunk_size in (1, 7, 1024):
+            chunks = [view[i:i + chunk_size] for i in range(0, len(view), chunk_size)]
+            assert collect_answer(iter_sse_events(chunks)) == expected, (newline, chunk_size)
+    for chunk_size in (64, 1024, 16384):
+        chunks = sse_stream(args.tokens, chunk_size)
+        for name, parse in parsers.items():
+            if name in ("legacy_split", "parser_buffered") and chunk_size != 1024:
+                continue
+            assert parse(chunks) == expected, name
+            samples = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                parse(chunks)
+                samples.append(time.perf_counter() - start)
+            best = min(samples)
+            yield summarize(f"sse_{name}", samples, chunk=chunk_size, tokens=args.tokens, bytes=len(body),
+                            mb_per_s=len(body) / best / 1e6)
+
+    # Event mix with many short lines and bare data fields
+    samples = []
+    chunks = sse_stream(args.tokens, 1024)
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        for _ in iter_sse_events(chunks):
+            pass
+        samples.append(time.perf_counter() - start)
+    yield summarize("sse_parser_events_only", samples, chunk=1024, tokens=args.tokens, bytes=len(body))
+
+def bench_answer(args):
+    """End-to-end GenerateAnswer latency against paced, failing and slow-loris servers"""
+    scenarios = {
+        "answer": {},
+        "answer_paced": {"token_delay": args.token_delay},
+        "answer_errors": {"error_rate": args.error_rate},
+        "answer_slow_loris": {"drip": 7, "drip_delay": args.token_delay / 10},
+    }
+    for name, options in scenarios.items():
+        with FakeYouServer(tokens=args.tokens, **options) as server:
+            # Retries would hide the injected failures
+            client = HTTPClient(max_retries=0)
+            samples, errors = [], 0
+            for _ in range(args.requests):
+                you = YOU("bench", client=client, api_url=server.api_url)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    you.GenerateAnswer()
+                samples.append(time.perf_counter() - start)
+                errors += bool(you.error)
+            client.close()
+        yield summarize(name, samples, tokens=args.tokens, errors=errors, **options)
+
+def bench_resilience(args):
+    """Tail latency with and without hedging, and the outcome of mid-stream stalls and resets"""
+    # One request in ten stalls a second before its headers
+    for hedge in (False, True):
+        with FakeYouServer(tokens=args.tokens, stall=1.0, stall_rate=0.1, seed=1) as server:
+            client = HTTPClient(max_retries=0)
+            metrics = Metrics()
+            policy = ResiliencePolicy(hedge=hedge, hedge_delay=0.2, metrics=metrics)
+            samples, hedged = [], 0
+            for _ in range(args.requests):
+                you = YOU("bench", client=client, api_url=server.api_url, policy=policy)
+                samples.append(timed_answer(you))
+                metrics.record(you.timings)
+                hedged += you.timings.hedged
+            client.close()
+        yield summarize("resilience_hedged" if hedge else "resilience_unhedged", samples,
+                        tokens=args.tokens, hedged=hedged, upstream=server.requests)
+
+    # Streams hanging or cut halfway, with and without event ids to resume from
+    scenarios = {
+        "resilience_stall": {"stall_after": args.tokens // 2, "hang": 2.0},
+        "resilience_reset": {"reset_after": args.tokens // 2},
+        "resilience_resume": {"reset_after": args.tokens // 2, "ids": True},
+    }
+    for name, options in scenarios.items():
+        with FakeYouServer(tokens=args.tokens, **options) as server:
+            client = HTTPClient(max_retries=0)
+            policy = ResiliencePolicy(idle_timeout=0.5, hedge=False)
+            samples, failures = [], {}
+            for _ in range(min(args.requests, 20)):
+                you = YOU("bench", client=client, api_url=server.api_url, policy=policy)
+                start = time.perf_counter()
+                for _ in you.StreamAnswer():
+                    pass
+                samples.append(time.perf_counter() - start)
+                failures[you.failure or "ok"] = failures.get(you.failure or "ok", 0) + 1
+            client.close()
+        yield summarize(name, samples, tokens=args.tokens, outcomes=failures, complete=you.timings.tokens == args.tokens,
+                        resumes=you.timings.resumes, upstream=server.requests)
+
+def large_answers(size):
+    """Markdown, table and code answers of roughly `size` lines each"""
+    markdown = "\n\n".join(
+        f"## Section {i}\n\nSome **bold** and *italic* text with `inline code` and a [link](https://example.com/{i}).\n\n- first item\n- second item"
+        for i in range(size // 6)
+    )
+    table = "| Name | Language | Stars | Description |\n|------|----------|-------|-------------|\n" + "\n".join(
+        f"| project-{i} | Python | {i * 7} | A library that does thing number {i} |" for i in range(size)
+    )
+    code = "Here is the code:\n\n```python\n" + "\n".join(
+        f"def function_{i}(value):\n    return value * {i}  # multiply" for i in range(size // 2)
+    ) + "\n```\n"
+    return {"markdown": markdown, "table": table, "code": code}
+
+def bench_format(args):
+    """ResultFormatter.format on large markdown, table and code answers"""
+    formatter = ResultFormatter("default", width=100)
+    for kind, text in large_answers(args.lines).items():
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            formatter.format(text)
+            samples.append(time.perf_counter() - start)
+        yield summarize(f"format_{kind}", samples, lines=text.count("\n") + 1, chars=len(text))
+
+HISTORY_START = datetime(2024, 1, 1)
+
+def write_history(path, entries):
+    """Write a synthetic history log of `entries` lines, one second apart from HISTORY_START"""
+    prompts = synthetic_prompts(min(entries, 10000))
+    start = HISTORY_START
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(entries):
+            prompt = prompts[i % len(prompts)]
+            item = {
+                "timestamp": (start + timedelta(seconds=i)).isoformat(),
+                "prompt": prompt,
+                "response": f"An answer about {prompt} with some more words in it.",
+                "meta": {"latency": 0.5, "bytes": 2048, "page": 1, "count": 1, "cached": False},
+            }
+            f.write(json.dumps(item) + "\n")
+
+def bare_history(path, max_items=100):
+    """A History over `path` that neither loads it nor compacts it in the background"""
+    return History(max_items, path, load=False, background_compaction=False)
+
+def bench_history(args):
+    """History load, compaction and add latency for logs of increasing size"""
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in args.sizes:
+            log = os.path.join(directory, f"history_{entries}.jsonl")
+            write_history(log, entries)
+            size = os.path.getsize(log)
+
+            loads = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                bare_history(log).load_history()
+                loads.append(time.perf_counter() - start)
+            yield summarize("history_load", loads, entries=entries, bytes=size)
+
+            work = os.path.join(directory, "work.jsonl")
+            shutil.copyfile(log, work)
+            start = time.perf_counter()
+            bare_history(work).compact()
+            yield summarize("history_compact", [time.perf_counter() - start], entries=entries, bytes=size)
+            shutil.rmtree(HistoryArchive.beside(work))
+
+            shutil.copyfile(log, work)
+            history = bare_history(work)
+            adds = []
+            for i in range(args.requests):
+                start = time.perf_counter()
+                history.add(f"bench prompt {i}", "bench answer", {"latency": 0.1})
+                adds.append(time.perf_counter() - start)
+            yield summarize("history_add", adds, entries=entries)
+            os.remove(work)
+
+# Runs one history query in a fresh interpreter and prints its peak RSS and time
+MEMORY_PROBE = """
+import json, resource, sys, time
+from datetime import datetime
+from bench_youc0m import bare_history
+backend, query, log = sys.argv[1:4]
+since, until = (datetime.fromisoformat(value) for value in sys.argv[4:6])
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if backend == "json_list":
+    # Everything loaded as a list of dicts, then filtered
+    with open(log, "rb") as f:
+        items = [json.loads(line) for line in f]
+    selected = [item for item in items if since <= datetime.fromisoformat(item["timestamp"]) < until]
+    result = {"count": len(selected), "last": len(selected[-20:]), "range": len(selected)}[query]
+else:
+    history = bare_history(log)
+    if backend == "log":
+        history.archive = None
+    if query == "count":
+        result = history.count(since, until)
+    else:
+        result = sum(1 for _ in history.iter_entries(since, until, last=20 if query == "last" else None))
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+scale = 1 if sys.platform == "darwin" else 1024
+print(json.dumps({"seconds": elapsed, "rss_mb": peak * scale / 2 ** 20, "added_mb": (peak - base) * scale / 2 ** 20, "result": result}))
+"""
+
+def bench_archive(args):
+    """Peak memory and time of history queries over a JSON list, the JSON lines log and the mmap archive"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in args.sizes:
+            log = os.path.join(directory, f"history_{entries}.jsonl")
+            write_history(log, entries)
+            # Compaction rolls everything but the last entries into the archive
+            work = os.path.join(directory, f"archived_{entries}.jsonl")
+            shutil.copyfile(log, work)
+            start = time.perf_counter()
+            bare_history(work).compact()
+            archive = HistoryArchive(HistoryArchive.beside(work))
+            archive_bytes = sum(os.path.getsize(os.path.join(archive.path, name)) for name in os.listdir(archive.path))
+            yield summarize("archive_roll", [time.perf_counter() - start], entries=entries,
+                            log_bytes=os.path.getsize(log), archive_bytes=archive_bytes)
+
+            # The queries select the middle 10% of the generated range
+            since = HISTORY_START + timedelta(seconds=entries * 45 // 100)
+            until = HISTORY_START + timedelta(seconds=entries * 55 // 100)
+            for query in ("count", "last", "range"):
+                for backend, path in (("json_list", log), ("log", log), ("archive", work)):
+                    probe = subprocess.run([sys.executable, "-c", MEMORY_PROBE, backend, query, path, since.isoformat(), until.isoformat()],
+                                           cwd=here, capture_output=True, text=True, check=True)
+                    result = json.loads(probe.stdout)
+                    yield summarize(f"archive_{query}_{backend}", [result["seconds"]], entries=entries, rss_mb=round(result["rss_mb"], 1),
+                                    added_mb=round(result["added_mb"], 1), matched=result["result"])
+
+def bench_export(args):
+    """Streaming export of a large history in every text format"""
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "history.jsonl")
+        write_history(log, args.entries)
+        history = bare_history(log)
+        system = CommandSystem({}, history)
+        for format_type in ("txt", "md", "json", "jsonl"):
+            writer = getattr(system, f"_export_{format_type}")
+            target = os.path.join(directory, f"export.{format_type}")
+            samples = []
+            for _ in range(max(1, args.runs // 5)):
+                start = time.perf_counter()
+                with open(target, "w", encoding="utf-8") as f:
+                    count = writer(history.iter_entries(), f)
+                samples.append(time.perf_counter() - start)
+            yield summarize(f"export_{format_type}", samples, entries=count, bytes=os.path.getsize(target))
+
+BENCHMARKS = {
+    "pool": bench_pool,
+    "startup": bench_startup,
+    "complete": bench_complete,
+    "pages": bench_pages,
+    "coalesce": bench_coalesce,
+    "context": bench_context,
+    "sse": bench_sse,
+    "answer": bench_answer,
+    "format": bench_format,
+    "history": bench_history,
+    "export": bench_export,
+    "archive": bench_archive,
+    "resilience": bench_resilience,
+}
+
+def run_info(label=None):
+    """Fields identifying a run so results can be compared over time"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "label": label,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="nice_youc0m benchmarks")
+    parser.add_argument("bench", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per fake answer")
+    parser.add_argument("--entries", type=int, default=100000, help="History size for the completion benchmark")
+    parser.add_argument("--pages", type=int, default=5, help="Result pages for the multi-page benchmark")
+    parser.add_argument("--concurrency", type=int, default=16, help="Identical requests per burst in the coalesce benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Repetitions per scenario")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Seconds between tokens in the paced answer scenario")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Fraction of failed requests in the error scenario")
+    parser.add_argument("--lines", type=int, default=2000, help="Lines per answer in the format benchmark")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[10000, 100000, 1000000],
+                        help="Comma separated history sizes")
+    parser.add_argument("--output", help="Also append the results to this JSON lines file")
+    parser.add_argument("--label", help="Free-form label stored with every result")
+    args = parser.parse_args()
+
+    info = run_info(args.label)
+    output = open(args.output, "a") if args.output else None
+    names = sorted(BENCHMARKS) if args.bench == "all" else [args.bench]
+    for name in names:
+        for result in BENCHMARKS[name](args):
+            line = json.dumps(dict(result, run=info))
+            print(line)
+            sys.stdout.flush()
+            if output:
+                output.write(line + "\n")
+                output.flush()
+    if output:
+        output.close()
+
+if __name__ == "__main__":
+    main()
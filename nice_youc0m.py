@@ -1,5 +1,9 @@
+import bisect
+import hashlib
+import heapq
+import html
 import json
-import requests
+import threading
 import time
 from urllib.parse import quote
 import re
@@ -7,56 +11,37 @@ import argparse
 import random
 import sys
 import os
-import readline
 import glob
-from datetime import datetime
-from pathlib import Path
+import shutil
+import socketserver
+import queue
+import mmap
+import struct
+from array import array
 try:
-    from pyfiglet import Figlet
-    FIGLET_AVAILABLE = True
+    import fcntl
 except ImportError:
-    print("Installing required pyfiglet library...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "pyfiglet"])
-    from pyfiglet import Figlet
-    FIGLET_AVAILABLE = True
+    fcntl = None
+import itertools
+from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from importlib.util import find_spec
+from pathlib import Path
+# rich, pyfiglet, pdfkit, requests and readline are imported on first use so
+# that one-shot invocations do not pay for the interactive UI at startup
+FIGLET_AVAILABLE = find_spec("pyfiglet") is not None
+RICH_AVAILABLE = find_spec("rich") is not None
+PDFKIT_AVAILABLE = find_spec("pdfkit") is not None
 
 try:
     from termcolor import colored
     TERMCOLOR_AVAILABLE = True
 except ImportError:
-    print("Installing required termcolor library...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "termcolor"])
-    from termcolor import colored
-    TERMCOLOR_AVAILABLE = True
-
-try:
-    from rich.console import Console
-    from rich.markdown import Markdown
-    from rich.table import Table
-    from rich.syntax import Syntax
-    from rich.panel import Panel
-    from rich.progress import Progress, SpinnerColumn, TextColumn
-    RICH_AVAILABLE = True
-except ImportError:
-    print("Installing required rich library...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "rich"])
-    from rich.console import Console
-    from rich.markdown import Markdown
-    from rich.table import Table
-    from rich.syntax import Syntax
-    from rich.panel import Panel
-    from rich.progress import Progress, SpinnerColumn, TextColumn
-    RICH_AVAILABLE = True
+    TERMCOLOR_AVAILABLE = False
+    
+    def colored(text, *args, **kwargs):
+        return text
 
-try:
-    import pdfkit
-    PDFKIT_AVAILABLE = True
-except ImportError:
-    print("pdfkit not available. PDF export will be disabled.")
-    PDFKIT_AVAILABLE = False
 COLORS = ['red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'white']
 THEMES = {
     'default': {
@@ -97,9 +82,20 @@ THEMES = {
     }
 }
 
+API_URL = "https://you.com/api/streamingSearch"
+RESPONSE_FILTER = "WebPages,Translations,TimeZone,Computation,RelatedSearches"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BOM = b"\xef\xbb\xbf"
+
 CONFIG_DIR = os.path.expanduser("~/.nice_youc0m")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
-HISTORY_FILE = os.path.join(CONFIG_DIR, "history.json")
+HISTORY_FILE = os.path.join(CONFIG_DIR, "history.jsonl")
+CACHE_DIR = os.path.join(CONFIG_DIR, "cache")
+SEARCH_DB = os.path.join(CONFIG_DIR, "search.db")
+DAEMON_SOCKET = os.path.join(CONFIG_DIR, "daemon.sock")
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+CODE_BLOCK = re.compile(r'```(\w+)?\n(.*?)\n```', re.DOTALL)
+TABLE_ROW = re.compile(r'\|.*\|.*\|')
 
 class Config:
     def __init__(self):
@@ -110,8 +106,38 @@ class Config:
             "theme": "default",
             "banner_font": "slant",
             "auto_completion": True,
+            "completion_mode": "prefix",
             "max_history": 100,
-            "export_format": "txt"
+            "export_format": "txt",
+            "stream": True,
+            "coalesce_requests": True,
+            "daemon_socket": None,
+            "archive_history": True,
+            "connect_timeout": 5,
+            "idle_timeout": 20,
+            "hedge_requests": True,
+            "hedge_delay": 3.0,
+            "hedge_budget": 0.05,
+            "max_resumes": 2,
+            "chat_context": True,
+            "context_max_turns": 10,
+            "context_max_bytes": 6000,
+            "render_width": None,
+            "api_url": API_URL,
+            "pool_connections": 4,
+            "pool_maxsize": 10,
+            "max_retries": 3,
+            "retry_backoff": 0.5,
+            "mkt": "en-US",
+            "safe_search": "Moderate",
+            "response_filter": RESPONSE_FILTER,
+            "cache_enabled": True,
+            "cache_ttl": 86400,
+            "cache_max_items": 256,
+            "cache_max_mb": 50,
+            "metrics_buffer": 1000,
+            "metrics_file": None,
+            "metrics_format": "jsonl"
         }
         
         if not os.path.exists(CONFIG_DIR):
@@ -140,52 +166,791 @@ class Config:
         self.config[key] = value
         self.save_config()
 
+class HistoryArchive:
+    """
+    Columnar store of the entries rolled out of the history log, in three
+    append-only files read through mmap: timestamps as packed int64
+    microseconds, the offset of each entry's record and a heap of records made
+    of length-prefixed UTF-8 strings (prompt, response and the other fields as
+    JSON), all in native byte order. Entries keep the order they were rolled
+    in. Counting and date ranges bisect the timestamps column, or scan it once
+    a clock set back made it unordered, and only the records listed are decoded.
+    """
+    EPOCH = datetime(1970, 1, 1)
+    LENGTH = struct.Struct("=I")
+    TIMESTAMPS = "timestamps.i64"
+    OFFSETS = "offsets.u64"
+    HEAP = "strings.heap"
+    UNORDERED = "unordered"
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.size = 0
+        self.maps = []
+        self.timestamps = self.offsets = self.heap = None
+        self.ordered = True
+    
+    @staticmethod
+    def beside(log_path):
+        """Archive path that goes with a history log"""
+        return os.path.splitext(log_path)[0] + ".archive"
+    
+    @classmethod
+    def encode_time(cls, timestamp):
+        moment = datetime.fromisoformat(timestamp).replace(tzinfo=None)
+        return (moment - cls.EPOCH) // timedelta(microseconds=1)
+    
+    @classmethod
+    def decode_time(cls, value):
+        return (cls.EPOCH + timedelta(microseconds=value)).isoformat()
+    
+    def _file(self, name):
+        return os.path.join(self.path, name)
+    
+    def _unmap(self):
+        for view in (self.timestamps, self.offsets):
+            if view is not None:
+                view.release()
+        for mapped in self.maps:
+            mapped.close()
+        self.maps = []
+        self.timestamps = self.offsets = self.heap = None
+        self.size = 0
+    
+    def _map(self):
+        """Map the columns, again whenever the timestamps column grew, and return the entry count"""
+        try:
+            size = os.path.getsize(self._file(self.TIMESTAMPS))
+        except OSError:
+            size = 0
+        size -= size % 8
+        if size != self.size:
+            self._unmap()
+            if size:
+                for name in (self.TIMESTAMPS, self.OFFSETS, self.HEAP):
+                    with open(self._file(name), 'rb') as f:
+                        self.maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                # The timestamps column is written last, its length commits the entries
+                self.timestamps = memoryview(self.maps[0])[:size].cast("q")
+                self.offsets = memoryview(self.maps[1])[:size].cast("Q")
+                self.heap = self.maps[2]
+                self.size = size
+                self.ordered = not os.path.exists(self._file(self.UNORDERED))
+        return self.size // 8
+    
+    def __len__(self):
+        with self.lock:
+            return self._map()
+    
+    def last_entry(self):
+        """The entry archived last, None when empty"""
+        with self.lock:
+            count = self._map()
+            return self.entry(count - 1) if count else None
+    
+    def select(self, since=None, until=None):
+        """Indexes of the entries from since (included) to until (excluded), in archive order"""
+        with self.lock:
+            count = self._map()
+            low = (since - self.EPOCH) // timedelta(microseconds=1) if since else None
+            high = (until - self.EPOCH) // timedelta(microseconds=1) if until else None
+            if not self.ordered:
+                timestamps = self.timestamps
+                return [index for index in range(count)
+                        if (low is None or timestamps[index] >= low) and (high is None or timestamps[index] < high)]
+            if not count:
+                return range(0)
+            first = bisect.bisect_left(self.timestamps, low) if since else 0
+            end = bisect.bisect_left(self.timestamps, high) if until else count
+            return range(first, max(first, end))
+    
+    def count(self, since=None, until=None):
+        return len(self.select(since, until))
+    
+    def _record(self, index):
+        """The strings of a record and the heap offset following it"""
+        heap = self.heap
+        position = self.offsets[index]
+        fields = []
+        for _ in range(3):
+            (length,) = self.LENGTH.unpack_from(heap, position)
+            position += 4
+            fields.append(heap[position:position + length].decode("utf-8"))
+            position += length
+        return fields, position
+    
+    def entry(self, index):
+        with self.lock:
+            self._map()
+            fields, _ = self._record(index)
+            item = {"timestamp": self.decode_time(self.timestamps[index]), "prompt": fields[0], "response": fields[1]}
+        if fields[2]:
+            # A timestamp that does not survive the int64 round trip is kept there as written
+            item.update(json.loads(fields[2]))
+        return item
+    
+    def iter_entries(self, since=None, until=None, last=None, match=None):
+        """Lazily yield archived entries in archive order, match is a lowercase needle"""
+        indexes = self.select(since, until)
+        if last is not None:
+            indexes = indexes[max(0, len(indexes) - last):]
+        for index in indexes:
+            item = self.entry(index)
+            if match and match not in item["prompt"].lower() and match not in item["response"].lower():
+                continue
+            yield item
+    
+    def append(self, items):
+        """Archive entries in the order given, returns how many were added"""
+        with self.lock:
+            count = self._map()
+            last = self.timestamps[count - 1] if count else None
+            ordered = self.ordered
+            heap_end = self._record(count - 1)[1] if count else 0
+            # Windows cannot truncate a mapped file
+            self._unmap()
+            
+            timestamps, offsets, records = array("q"), array("Q"), bytearray()
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file(self.HEAP), 'a+b') as heap:
+                # Drop what an interrupted append left after the last committed entry
+                if heap.seek(0, os.SEEK_END) > heap_end:
+                    heap.truncate(heap_end)
+                base = heap_end
+                for item in items:
+                    extra = {key: value for key, value in item.items() if key not in ("timestamp", "prompt", "response")}
+                    try:
+                        moment = self.encode_time(item["timestamp"])
+                    except (KeyError, TypeError, ValueError):
+                        moment = 0
+                    if "timestamp" in item and self.decode_time(moment) != item["timestamp"]:
+                        extra["timestamp"] = item["timestamp"]
+                    if last is not None and moment < last:
+                        ordered = False
+                    last = moment
+                    timestamps.append(moment)
+                    offsets.append(base + len(records))
+                    for text in (item.get("prompt", ""), item.get("response", ""), json.dumps(extra, ensure_ascii=False) if extra else ""):
+                        data = text.encode("utf-8")
+                        records += self.LENGTH.pack(len(data))
+                        records += data
+                if not timestamps:
+                    return 0
+                heap.write(records)
+                heap.flush()
+                os.fsync(heap.fileno())
+            if not ordered:
+                # Flagged before the entries are committed, so readers never bisect them
+                open(self._file(self.UNORDERED), 'a').close()
+            for name, column in ((self.OFFSETS, offsets), (self.TIMESTAMPS, timestamps)):
+                with open(self._file(name), 'a+b') as f:
+                    f.truncate(count * 8)
+                    f.seek(0, os.SEEK_END)
+                    column.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            return len(timestamps)
+    
+    def clear(self):
+        with self.lock:
+            self._unmap()
+            shutil.rmtree(self.path, ignore_errors=True)
+
 class History:
-    def __init__(self, max_items=100):
+    """
+    Conversation history kept as an append-only JSON lines log.
+    Each add appends and fsyncs a single line, only the last max_items entries
+    are loaded, and older lines are compacted away in a background thread,
+    moving them to the HistoryArchive next to the log unless archive is off.
+    With load off nothing is read or migrated up front, for tools that only
+    append or iterate over the log.
+    """
+    def __init__(self, max_items=100, path=HISTORY_FILE, archive=True, load=True, background_compaction=True):
         self.max_items = max_items
-        self.history = self.load_history()
+        self.path = path
+        self.archive = HistoryArchive(HistoryArchive.beside(path)) if archive else None
+        self.background_compaction = background_compaction
+        self.appended = 0
+        self.compacting = threading.Lock()
+        self.listeners = []
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if load:
+            self.migrate_legacy()
+        self.history = deque(self.load_history() if load else (), maxlen=max_items)
+        
+    def migrate_legacy(self):
+        """Convert the JSON list kept by older versions next to the log, history.json for history.jsonl"""
+        legacy_path = os.path.splitext(self.path)[0] + ".json"
+        if os.path.exists(self.path) or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                items = json.load(f)
+        except:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for item in items:
+                # Older versions stored the rendered terminal output
+                item["response"] = ANSI_ESCAPE.sub("", item.get("response", ""))
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        os.replace(legacy_path, legacy_path + ".bak")
+    
+    def _read_tail(self, f, count):
+        """Return the last `count` complete lines of the file and whether older lines exist"""
+        block_size = 64 * 1024
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
         
+        lines = data.split(b"\n")
+        if position > 0:
+            lines = lines[1:]
+        lines = [line for line in lines if line.strip()]
+        return lines[-count:], position > 0 or len(lines) > count
+    
     def load_history(self):
-        if os.path.exists(HISTORY_FILE):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'rb') as f:
+                lines, truncated = self._read_tail(f, self.max_items)
+        except OSError:
+            return []
+        
+        items = []
+        for line in lines:
             try:
-                with open(HISTORY_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+                items.append(json.loads(line))
+            except ValueError:
+                # Partial line left behind by an interrupted write
+                continue
+        
+        if truncated:
+            self.compact_in_background()
+        return items
+    
+    def _open_locked(self, mode):
+        """
+        Open the log and lock it, reopening if a concurrent compaction
+        replaced the file while we were waiting for the lock
+        """
+        while True:
+            f = open(self.path, mode)
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+    
+    def _append(self, item):
+        line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+        f = self._open_locked('a+b')
+        try:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
     
-    def save_history(self):
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(self.history[-self.max_items:], f, indent=2)
+    def compact(self):
+        """Rewrite the log keeping only the last max_items entries, archiving the others"""
+        if not self.compacting.acquire(blocking=False):
+            return
+        try:
+            f = self._open_locked('rb')
+            try:
+                kept = deque(maxlen=self.max_items)
+                rolled = []
+                archived = self._archived_lines(f)
+                for number, line in enumerate(f, 1):
+                    if number > archived and line.strip():
+                        if len(kept) == self.max_items and self.archive is not None:
+                            rolled.append(kept[0])
+                            if len(rolled) >= 10000:
+                                self._roll(rolled)
+                        kept.append(line if line.endswith(b"\n") else line + b"\n")
+                # Archived before the log is replaced, a crash in between leaves lines
+                # that _archived_lines recognizes and skips
+                self._roll(rolled)
+                
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as out:
+                    out.writelines(kept)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path, self.path)
+                self.appended = 0
+            finally:
+                f.close()
+        except OSError:
+            pass
+        finally:
+            self.compacting.release()
+    
+    def _roll(self, lines):
+        items = []
+        for line in lines:
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                continue
+        if items:
+            self.archive.append(items)
+        lines.clear()
     
-    def add(self, prompt, response):
-        self.history.append({
+    def compact_in_background(self):
+        if not self.background_compaction:
+            return
+        threading.Thread(target=self.compact, daemon=True).start()
+    
+    def add(self, prompt, response, meta=None, results=None, error=None):
+        """
+        Store a prompt with the raw answer text, request metadata and web results.
+        A failed query keeps its error apart and no answer, even a partial one.
+        """
+        item = {
             "timestamp": datetime.now().isoformat(),
             "prompt": prompt,
-            "response": response
-        })
-        self.save_history()
+            "response": "" if error else response
+        }
+        if error:
+            item["error"] = error
+        if meta:
+            item["meta"] = meta
+        if results:
+            item["results"] = results
+        self.history.append(item)
+        self._append(item)
+        self.appended += 1
+        if self.appended >= self.max_items:
+            self.compact_in_background()
+        for listener in self.listeners:
+            listener(item)
+    
+    def subscribe(self, listener):
+        """Call listener(item) after every new entry, used to keep indexes up to date"""
+        self.listeners.append(listener)
     
     def clear(self):
-        self.history = []
-        self.save_history()
+        self.history.clear()
+        if self.archive is not None:
+            self.archive.clear()
+        if os.path.exists(self.path):
+            f = self._open_locked('r+b')
+            try:
+                f.truncate(0)
+            finally:
+                f.close()
+    
+    def iter_entries(self, since=None, until=None, last=None, match=None):
+        """
+        Lazily yield the archived then logged entries, oldest first, optionally
+        limited to a date range, a case-insensitive text match and the last n
+        """
+        needle = match.lower() if match else None
+        if self.archive is None:
+            archived = iter(())
+        elif last and not needle:
+            # The archive is sliced by index, only the entries listed are decoded
+            recent = deque(self._read_entries(since, until, None), maxlen=last)
+            yield from self.archive.iter_entries(since, until, last - len(recent))
+            yield from recent
+            return
+        else:
+            archived = self.archive.iter_entries(since, until, match=needle)
+        entries = itertools.chain(archived, self._read_entries(since, until, needle))
+        if last:
+            # Only the last n matching entries are ever held in memory
+            entries = deque(entries, maxlen=last)
+        yield from entries
+    
+    def count(self, since=None, until=None):
+        """Number of entries, archived ones are counted without being read"""
+        archived = self.archive.count(since, until) if self.archive is not None else 0
+        return archived + sum(1 for _ in self._read_entries(since, until, None))
+    
+    def _archived_lines(self, f):
+        """
+        Number of leading log lines already archived, left behind by a
+        compaction interrupted between the archive append and the log rewrite.
+        They end with the last archived entry, found by content, not by time.
+        """
+        last = self.archive.last_entry() if self.archive is not None else None
+        if last is None:
+            return 0
+        marker = json.dumps(last.get("timestamp"), ensure_ascii=False).encode("utf-8")
+        archived = 0
+        for number, line in enumerate(f, 1):
+            if marker in line:
+                try:
+                    if json.loads(line) == last:
+                        archived = number
+                        break
+                except ValueError:
+                    continue
+        f.seek(0)
+        return archived
+    
+    def _read_entries(self, since, until, needle):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            archived = self._archived_lines(f)
+            for number, line in enumerate(f, 1):
+                if number <= archived:
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if since or until:
+                    try:
+                        # Compared as local wall time, like the archive's timestamps
+                        timestamp = datetime.fromisoformat(item["timestamp"]).replace(tzinfo=None)
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    if (since and timestamp < since) or (until and timestamp >= until):
+                        continue
+                if needle and needle not in item["prompt"].lower() and needle not in item["response"].lower():
+                    continue
+                yield item
     
     def get(self, limit=None):
+        items = list(self.history)
         if limit:
-            return self.history[-limit:]
-        return self.history
+            return items[-limit:]
+        return items
+
+class ChatContext:
+    """
+    Sliding window of the previous turns sent upstream as the `chat` query
+    parameter. Each turn is JSON encoded and URL quoted once when it is added,
+    and the oldest turns are dropped to stay within max_turns and max_bytes,
+    so building the parameter only joins the small window of fragments.
+    """
+    def __init__(self, max_turns=10, max_bytes=6000):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.turns = deque()
+        self.size = 0
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("context_max_turns", 10), config.get("context_max_bytes", 6000))
+    
+    @staticmethod
+    def _encode(question, answer):
+        return quote(json.dumps({"question": question, "answer": answer}, ensure_ascii=False, separators=(",", ":")), safe="")
+    
+    def add(self, item):
+        """History listener: append a finished turn, failed answers are left out"""
+        question, answer = item["prompt"], item["response"]
+        if not answer or item.get("error") or answer.startswith("Error: ") or self.max_turns <= 0:
+            return
+        
+        fragment = self._encode(question, answer)
+        # A turn too large on its own keeps only the start of its answer
+        while len(fragment) + 6 > self.max_bytes and answer:
+            answer = answer[:len(answer) * self.max_bytes // (len(fragment) + 6) - 1]
+            fragment = self._encode(question, answer + "…")
+        if len(fragment) + 6 > self.max_bytes:
+            return
+        
+        self.turns.append(fragment)
+        self.size += len(fragment) + 3
+        while len(self.turns) > self.max_turns or self.size + 3 > self.max_bytes:
+            self.size -= len(self.turns.popleft()) + 3
+    
+    def seed(self, items):
+        """Resume a conversation from entries of the history, oldest first"""
+        for item in items:
+            self.add(item)
+    
+    def clear(self):
+        self.turns.clear()
+        self.size = 0
+    
+    def encoded(self):
+        """The URL quoted JSON array of the window, empty when there is no context"""
+        if not self.turns:
+            return ""
+        return "%5B" + "%2C".join(self.turns) + "%5D"
+
+class ResponseCache:
+    """
+    Raw answer cache with an in-memory LRU tier in front of one JSON file per
+    entry under CACHE_DIR. Entries expire after ttl seconds and the disk tier
+    is trimmed oldest first once it grows past max_bytes.
+    """
+    def __init__(self, path=CACHE_DIR, ttl=86400, max_items=256, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._disk_bytes = None
+        os.makedirs(path, exist_ok=True)
+    
+    @property
+    def disk_bytes(self):
+        # Scanning the cache directory is deferred until the size is needed
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.name.endswith(".json"))
+        return self._disk_bytes
+    
+    @disk_bytes.setter
+    def disk_bytes(self, value):
+        self._disk_bytes = value
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            ttl=config.get("cache_ttl", 86400),
+            max_items=config.get("cache_max_items", 256),
+            max_bytes=int(config.get("cache_max_mb", 50) * 1024 * 1024),
+        )
+    
+    @staticmethod
+    def key(prompt, page=1, count=1, mkt="en-US", safe_search="Moderate", response_filter=RESPONSE_FILTER, chat=""):
+        normalized = " ".join(prompt.lower().split())
+        params = [normalized, page, count, mkt, safe_search, response_filter]
+        if chat:
+            # Follow-up questions only share answers within the same context
+            params.append(chat)
+        raw = json.dumps(params)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
+    
+    def _remember(self, key, stored_at, answer, results):
+        self.memory[key] = (stored_at, answer, results)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+    
+    def get(self, key):
+        """Return the cached (raw answer, results dict) for key, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1], entry[2]
+            self.memory.pop(key, None)
+        
+        try:
+            with open(self._file(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        
+        with self.lock:
+            if entry and now - entry["stored_at"] < self.ttl:
+                results = entry.get("results", {})
+                self._remember(key, entry["stored_at"], entry["answer"], results)
+                self.stats["disk_hits"] += 1
+                return entry["answer"], results
+            self.stats["misses"] += 1
+        if entry:
+            self._remove(self._file(key))
+        return None
+    
+    def set(self, key, answer, results=None):
+        stored_at = time.time()
+        results = results or {}
+        data = json.dumps({"stored_at": stored_at, "answer": answer, "results": results}, ensure_ascii=False).encode("utf-8")
+        filename = self._file(key)
+        tmp_path = f"{filename}.{threading.get_ident()}.tmp"
+        
+        with self.lock:
+            self._remember(key, stored_at, answer, results)
+            self.stats["stores"] += 1
+        try:
+            previous = os.path.getsize(filename) if os.path.exists(filename) else 0
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, filename)
+        except OSError:
+            return
+        
+        with self.lock:
+            self.disk_bytes += len(data) - previous
+            over_limit = self.disk_bytes > self.max_bytes
+        if over_limit:
+            self._trim_disk()
+    
+    def _remove(self, filename):
+        try:
+            size = os.path.getsize(filename)
+            os.remove(filename)
+        except OSError:
+            return
+        with self.lock:
+            self.disk_bytes -= size
+    
+    def _trim_disk(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.path) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self.disk_bytes <= self.max_bytes * 0.9:
+                break
+            self._remove(entry.path)
+            with self.lock:
+                self.memory.pop(entry.name[:-len(".json")], None)
+                self.stats["evictions"] += 1
+    
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".json"):
+                self._remove(entry.path)
+    
+    def summary(self):
+        with self.lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            summary = dict(self.stats)
+            summary["hit_rate"] = hits / lookups if lookups else 0.0
+            summary["memory_entries"] = len(self.memory)
+            summary["disk_bytes"] = self.disk_bytes
+        return summary
+
+class SearchIndex:
+    """
+    Full-text index over every prompt and answer, stored in an SQLite FTS5
+    table. It is fed incrementally by History.add and rebuilt lazily from the
+    history archive and log when the database is missing.
+    """
+    def __init__(self, path=SEARCH_DB, history_path=HISTORY_FILE, page_size=10):
+        self.path = path
+        self.history_path = history_path
+        self.page_size = page_size
+        self.db = None
+        self.error = None
+        self.lock = threading.Lock()
+    
+    def _connect(self):
+        """Open the database on first use, returns True if it was just rebuilt"""
+        if self.db is not None or self.error:
+            return False
+        import sqlite3
+        
+        rebuild = not os.path.exists(self.path)
+        try:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entries "
+                "USING fts5(prompt, response, timestamp UNINDEXED)"
+            )
+        except sqlite3.Error as e:
+            self.error = f"Search index unavailable - {str(e)}"
+            self.db = None
+            return False
+        
+        if rebuild:
+            self.rebuild()
+        return rebuild
+    
+    def rebuild(self):
+        """Re-index the whole history archive and log, streaming them in batches"""
+        self.db.execute("DELETE FROM entries")
+        batch = []
+        for item in self._entries():
+            batch.append((item.get("prompt", ""), item.get("response", ""), item.get("timestamp", "")))
+            if len(batch) >= 1000:
+                self.db.executemany("INSERT INTO entries VALUES (?, ?, ?)", batch)
+                batch = []
+        if batch:
+            self.db.executemany("INSERT INTO entries VALUES (?, ?, ?)", batch)
+        self.db.commit()
+    
+    def _entries(self):
+        return History(path=self.history_path, load=False, background_compaction=False).iter_entries()
+    
+    def add(self, item):
+        with self.lock:
+            # A fresh rebuild already picked the new entry up from the log
+            if self._connect() or self.db is None:
+                return
+            self.db.execute("INSERT INTO entries VALUES (?, ?, ?)", (item["prompt"], item["response"], item["timestamp"]))
+            self.db.commit()
+    
+    def clear(self):
+        with self.lock:
+            self._connect()
+            if self.db is not None:
+                self.db.execute("DELETE FROM entries")
+                self.db.commit()
+    
+    @staticmethod
+    def _query(terms):
+        # Quote every term so user input is never parsed as FTS5 syntax
+        return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    
+    def search(self, terms, page=1):
+        """Return (total, results) for one page of matches, best ranked first"""
+        with self.lock:
+            self._connect()
+            if self.db is None:
+                return 0, []
+            query = self._query(terms)
+            total = self.db.execute("SELECT count(*) FROM entries WHERE entries MATCH ?", (query,)).fetchone()[0]
+            rows = self.db.execute(
+                "SELECT timestamp, prompt, snippet(entries, 1, '[', ']', '...', 16) FROM entries "
+                "WHERE entries MATCH ? ORDER BY bm25(entries, 2.0, 1.0) LIMIT ? OFFSET ?",
+                (query, self.page_size, (page - 1) * self.page_size),
+            ).fetchall()
+        return total, rows
 
 class CommandSystem:
-    def __init__(self, config, history):
+    def __init__(self, config, history, cache=None, search=None, metrics=None, context=None):
         self.config = config
         self.history = history
+        self.cache = cache
+        self.search = search
+        self.metrics = metrics
+        self.context = context
+        self.renders = OrderedDict()
         self.commands = {
             "/help": self.show_help,
             "/history": self.show_history,
+            "/show": self.show_entry,
+            "/results": self.show_results,
+            "/search": self.search_history,
             "/clear": self.clear_history,
             "/export": self.export_conversation,
             "/theme": self.change_theme,
             "/settings": self.show_settings,
+            "/cache": self.show_cache,
+            "/stats": self.show_stats,
+            "/new": self.new_conversation,
             "/reset": self.reset_config,
             "/exit": self.exit_program
         }
@@ -206,10 +971,17 @@ class CommandSystem:
         
         /help           - Show this help message
         /history [n]    - Show conversation history (last n items, default 10)
+        /show [n]       - Show the full n-th most recent answer (default 1)
+        /results [n]    - Expand the sources, related searches and computations of an answer
+        /search <terms> [--page n] - Search all past prompts and answers
         /clear          - Clear conversation history
-        /export [format]- Export conversation (txt, md, json, pdf)
+        /export [format] [--last n] [--since date] [--until date] [--match text] [--gzip|--zstd]
+                        - Export conversation (txt, md, json, jsonl, pdf)
         /theme [name]   - Change color theme (default, dark, light, ocean)
         /settings       - Show current settings
+        /cache [clear]  - Show response cache statistics or clear the cache
+        /stats          - Show p50/p95/p99 timings of the recent queries
+        /new            - Start a new conversation, previous turns are no longer sent
         /reset          - Reset configuration to defaults
         /exit           - Exit the program
         """
@@ -227,92 +999,269 @@ class CommandSystem:
             timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
             output += f"\n[{i}] {timestamp}\n"
             output += colored(f"> {item['prompt']}\n", "green")
+            if item.get("error"):
+                output += colored(f"Failed: {item['error']}\n", "red")
+                continue
             output += f"{item['response'][:100]}{'...' if len(item['response']) > 100 else ''}\n"
         
+        total = self.history.count()
+        if total > len(history):
+            output += colored(f"\nShowing the last {len(history)} of {total} entries (/export for all of them)\n", "blue")
+        return output
+    
+    def render(self, item, width=None):
+        """Render an entry's raw answer, memoized per entry and terminal width"""
+        width = width or self.config.get("render_width") or shutil.get_terminal_size().columns
+        key = (item["timestamp"], item["prompt"], width)
+        if key in self.renders:
+            self.renders.move_to_end(key)
+            return self.renders[key]
+        
+        rendered = ResultFormatter.shared().format(item["response"], width)
+        
+        self.renders[key] = rendered
+        if len(self.renders) > 64:
+            self.renders.popitem(last=False)
+        return rendered
+    
+    def show_entry(self, args):
+        index = int(args[0]) if args and args[0].isdigit() and int(args[0]) > 0 else 1
+        history = self.history.get(index)
+        
+        if len(history) < index:
+            return colored(f"No history entry #{index}.", "yellow")
+        
+        item = history[0]
+        timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        output = f"\n{timestamp}\n"
+        output += colored(f"> {item['prompt']}\n", "green")
+        output += colored(f"Failed: {item['error']}\n", "red") if item.get("error") else self.render(item)
+        
+        meta = item.get("meta")
+        if meta:
+            details = [f"{meta['latency']:.2f}s" if "latency" in meta else None,
+                       f"{meta['bytes']} bytes" if "bytes" in meta else None,
+                       f"page {meta['page']}, count {meta['count']}" if "page" in meta else None,
+                       "cached" if meta.get("cached") else None,
+                       meta.get("failure")]
+            output += colored(" · ".join(detail for detail in details if detail), "blue")
+        
+        results = SearchResults.from_dict(item.get("results"))
+        if results:
+            output += colored(f"\n📚 {results.summary()} (/results {index} to expand)", "blue")
+        return output
+    
+    def show_results(self, args):
+        index = int(args[0]) if args and args[0].isdigit() and int(args[0]) > 0 else 1
+        history = self.history.get(index)
+        
+        if len(history) < index:
+            return colored(f"No history entry #{index}.", "yellow")
+        
+        item = history[0]
+        results = SearchResults.from_dict(item.get("results"))
+        if not results:
+            return colored("No sources, related searches or computations for this answer.", "yellow")
+        
+        output = colored(f"> {item['prompt']}\n", "green")
+        for kind, label in SearchResults.LABELS.items():
+            records = getattr(results, kind)
+            if records:
+                output += colored(f"\n{label.capitalize()}:\n", "blue")
+                for i, record in enumerate(records, 1):
+                    output += f"[{i}] {record}\n"
+        return output
+    
+    def search_history(self, args):
+        if self.search is None:
+            return colored("Search is disabled.", "yellow")
+        
+        page = 1
+        if "--page" in args:
+            position = args.index("--page")
+            if position + 1 < len(args) and args[position + 1].isdigit():
+                page = max(1, int(args[position + 1]))
+            args = args[:position] + args[position + 2:]
+        if not args:
+            return colored("Usage: /search <terms> [--page n]", "yellow")
+        
+        total, results = self.search.search(args, page)
+        if self.search.error:
+            return colored(self.search.error, "red")
+        if not results:
+            return colored(f"No results for: {' '.join(args)}", "yellow")
+        
+        pages = (total + self.search.page_size - 1) // self.search.page_size
+        output = colored(f"{total} result(s), page {page}/{pages}\n", "blue")
+        for i, (timestamp, prompt, snippet) in enumerate(results, (page - 1) * self.search.page_size + 1):
+            timestamp = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            output += f"\n[{i}] {timestamp}\n"
+            output += colored(f"> {prompt}\n", "green")
+            output += f"{snippet}\n"
         return output
     
     def clear_history(self, args):
         self.history.clear()
+        if self.search is not None:
+            self.search.clear()
         return colored("Conversation history cleared.", "green")
     
+    def _parse_export_args(self, args):
+        options = {"format": None, "since": None, "until": None, "last": None, "match": None, "compression": None}
+        position = 0
+        while position < len(args):
+            arg = args[position]
+            if arg in ("--gzip", "--zstd"):
+                options["compression"] = arg[2:]
+            elif arg in ("--since", "--until", "--last", "--match") and position + 1 < len(args):
+                position += 1
+                options[arg[2:]] = args[position]
+            elif options["format"] is None:
+                options["format"] = arg
+            else:
+                raise ValueError(f"Unexpected argument: {arg}")
+            position += 1
+        
+        if options["since"]:
+            options["since"] = datetime.fromisoformat(options["since"])
+        if options["until"]:
+            until = options["until"]
+            options["until"] = datetime.fromisoformat(until)
+            if len(until) == 10:
+                # A bare date includes the whole day
+                options["until"] += timedelta(days=1)
+        for name in ("since", "until"):
+            if options[name] and options[name].tzinfo is not None:
+                raise ValueError(f"--{name} takes a local date or time, without a timezone")
+        if options["last"]:
+            options["last"] = int(options["last"])
+            if options["last"] < 1:
+                raise ValueError("--last must be at least 1")
+        return options
+    
+    def _open_export(self, filename, compression):
+        if compression == "gzip":
+            import gzip
+            return gzip.open(filename, 'wt', encoding='utf-8')
+        if compression == "zstd":
+            import io
+            import zstandard
+            return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(filename, 'wb')), encoding='utf-8')
+        return open(filename, 'w', encoding='utf-8')
+    
     def export_conversation(self, args):
-        format_type = args[0] if args else self.config.get("export_format", "txt")
-        history = self.history.get()
+        try:
+            options = self._parse_export_args(args)
+        except ValueError as e:
+            return colored(f"Invalid export options: {str(e)}", "red")
         
-        if not history:
-            return colored("No conversation history to export.", "yellow")
+        format_type = options["format"] or self.config.get("export_format", "txt")
+        compression = options["compression"]
+        if format_type not in ("txt", "md", "json", "jsonl", "pdf"):
+            return colored(f"Unsupported export format: {format_type}", "red")
+        if format_type == "pdf" and not PDFKIT_AVAILABLE:
+            return colored("PDF export requires pdfkit library. Install with: pip install pdfkit", "red")
+        if format_type == "pdf" and compression:
+            return colored("PDF export cannot be compressed.", "red")
+        if compression == "zstd" and find_spec("zstandard") is None:
+            return colored("zstd compression requires the zstandard library. Install with: pip install zstandard", "red")
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"you_export_{timestamp}.{format_type}"
+        if compression:
+            filename += ".gz" if compression == "gzip" else ".zst"
         
         try:
-            if format_type == "txt":
-                self._export_txt(history, filename)
-            elif format_type == "md":
-                self._export_md(history, filename)
-            elif format_type == "json":
-                self._export_json(history, filename)
-            elif format_type == "pdf":
-                if PDFKIT_AVAILABLE:
-                    self._export_pdf(history, filename)
-                else:
-                    return colored("PDF export requires pdfkit library. Install with: pip install pdfkit", "red")
+            entries = self.history.iter_entries(options["since"], options["until"], options["last"], options["match"])
+            first = next(entries, None)
+            if first is None:
+                return colored("No conversation history to export.", "yellow")
+            entries = itertools.chain([first], entries)
+            
+            if format_type == "pdf":
+                count = self._export_pdf(entries, filename)
             else:
-                return colored(f"Unsupported export format: {format_type}", "red")
+                writer = getattr(self, f"_export_{format_type}")
+                with self._open_export(filename, compression) as f:
+                    count = writer(entries, f)
             
-            return colored(f"Conversation exported to {filename}", "green")
+            return colored(f"{count} entries exported to {filename}", "green")
         except Exception as e:
             return colored(f"Export failed: {str(e)}", "red")
     
-    def _export_txt(self, history, filename):
-        with open(filename, 'w') as f:
-            for item in history:
-                timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{timestamp}]\n")
-                f.write(f"> {item['prompt']}\n")
-                f.write(f"{item['response']}\n\n")
-    
-    def _export_md(self, history, filename):
-        with open(filename, 'w') as f:
-            f.write("# YOU.COM Conversation Export\n\n")
-            for item in history:
-                timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"## {timestamp}\n\n")
-                f.write(f"**Prompt:** {item['prompt']}\n\n")
-                f.write(f"**Response:**\n\n{item['response']}\n\n---\n\n")
+    def _export_txt(self, entries, f):
+        count = 0
+        for count, item in enumerate(entries, 1):
+            timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{timestamp}]\n")
+            f.write(f"> {item['prompt']}\n")
+            f.write(f"{item['response']}\n\n")
+        return count
+    
+    def _export_md(self, entries, f):
+        count = 0
+        f.write("# YOU.COM Conversation Export\n\n")
+        for count, item in enumerate(entries, 1):
+            timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"## {timestamp}\n\n")
+            f.write(f"**Prompt:** {item['prompt']}\n\n")
+            f.write(f"**Response:**\n\n{item['response']}\n\n---\n\n")
+        return count
+    
+    def _export_json(self, entries, f):
+        # The array is written entry by entry instead of dumping a whole list
+        count = 0
+        f.write("[")
+        for count, item in enumerate(entries, 1):
+            f.write(",\n  " if count > 1 else "\n  ")
+            f.write(json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+        f.write("\n]\n" if count else "]\n")
+        return count
     
-    def _export_json(self, history, filename):
-        with open(filename, 'w') as f:
-            json.dump(history, f, indent=2)
+    def _export_jsonl(self, entries, f):
+        count = 0
+        for count, item in enumerate(entries, 1):
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        return count
     
-    def _export_pdf(self, history, filename):
-        html_content = """
+    def _export_pdf(self, entries, filename):
+        import pdfkit
+        import tempfile
+        
+        count = 0
+        # The HTML goes to a temporary file so it never sits in memory as one string
+        with tempfile.NamedTemporaryFile('w', suffix=".html", encoding='utf-8', delete=False) as f:
+            f.write("""
         <!DOCTYPE html>
         <html>
         <head>
+            <meta charset="utf-8">
             <title>YOU.COM Conversation Export</title>
             <style>
                 body { font-family: Arial, sans-serif; line-height: 1.6; }
                 .timestamp { color: #666; font-size: 0.9em; }
                 .prompt { font-weight: bold; color: #0066cc; }
-                .response { margin-bottom: 20px; }
+                .response { margin-bottom: 20px; white-space: pre-wrap; }
             </style>
         </head>
         <body>
         <h1>YOU.COM Conversation Export</h1>
-        """
-        
-        for item in history:
-            timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-            html_content += f"""
+        """)
+            for count, item in enumerate(entries, 1):
+                timestamp = datetime.fromisoformat(item["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+                f.write(f"""
             <div class="timestamp">{timestamp}</div>
-            <div class="prompt">Prompt: {item['prompt']}</div>
-            <div class="response">{item['response']}</div>
+            <div class="prompt">Prompt: {html.escape(item['prompt'])}</div>
+            <div class="response">{html.escape(item['response'])}</div>
             <hr>
-            """
+            """)
+            f.write("</body></html>")
         
-        html_content += "</body></html>"
-        pdfkit.from_string(html_content, filename)
+        try:
+            pdfkit.from_file(f.name, filename)
+        finally:
+            os.remove(f.name)
+        return count
     
     def change_theme(self, args):
         if not args:
@@ -327,6 +1276,12 @@ class CommandSystem:
             themes = ", ".join(THEMES.keys())
             return colored(f"Unknown theme: {theme_name}. Available themes: {themes}", "red")
     
+    def new_conversation(self, args):
+        if self.context is None:
+            return colored("Conversation context is disabled.", "yellow")
+        self.context.clear()
+        return colored("Started a new conversation.", "green")
+    
     def show_settings(self, args):
         settings = self.config.config
         output = "Current Settings:\n\n"
@@ -334,6 +1289,39 @@ class CommandSystem:
             output += f"{key}: {value}\n"
         return output
     
+    def show_cache(self, args):
+        if self.cache is None:
+            return colored("Response cache is disabled.", "yellow")
+        
+        if args and args[0] == "clear":
+            self.cache.clear()
+            return colored("Response cache cleared.", "green")
+        
+        summary = self.cache.summary()
+        output = "Response Cache:\n\n"
+        output += f"memory hits: {summary['memory_hits']}\n"
+        output += f"disk hits: {summary['disk_hits']}\n"
+        output += f"misses: {summary['misses']}\n"
+        output += f"hit rate: {summary['hit_rate']:.1%}\n"
+        output += f"stored: {summary['stores']}\n"
+        output += f"evicted: {summary['evictions']}\n"
+        output += f"memory entries: {summary['memory_entries']}\n"
+        output += f"disk size: {summary['disk_bytes'] / 1024:.1f} KB\n"
+        return output
+    
+    def show_stats(self, args):
+        summary = self.metrics.summary() if self.metrics is not None else {"count": 0}
+        if not summary["count"]:
+            return colored("No queries measured yet.", "yellow")
+        
+        output = f"Query Timings (last {summary['count']}, {summary['cached']} cached, {summary['coalesced']} coalesced, {summary['hedged']} hedged, {summary['errors']} failed):\n\n"
+        output += f"{'':<10}{'p50':>10}{'p95':>10}{'p99':>10}\n"
+        for field in RequestTimings.DURATIONS:
+            output += f"{field:<10}" + "".join(f"{value * 1000:>8.1f}ms" for value in summary[field]) + "\n"
+        output += f"{'bytes':<10}" + "".join(f"{value:>10}" for value in summary["bytes"]) + "\n"
+        output += f"{'tokens':<10}" + "".join(f"{value:>10}" for value in summary["tokens"]) + "\n"
+        return output
+    
     def reset_config(self, args):
         self.config.config = Config().load_config()
         self.config.save_config()
@@ -342,25 +1330,126 @@ class CommandSystem:
     def exit_program(self, args):
         raise KeyboardInterrupt
 
+class PromptIndex:
+    """
+    Completion index over deduplicated prompts, ranked by frequency then recency.
+    Prefixes of up to TOP_PREFIX characters keep a precomputed top list that is
+    updated on every add; longer prefixes bisect a sorted array of prompts and
+    memoize their top list too once they match more than HEAVY_RANGE prompts.
+    """
+    TOP_PREFIX = 3
+    HEAVY_RANGE = 256
+    
+    def __init__(self, prompts=(), limit=20):
+        self.limit = limit
+        self.stats = {}
+        self.top = {}
+        self.seq = 0
+        for prompt in prompts:
+            prompt = self.normalize(prompt)
+            if prompt:
+                self._count(prompt)
+        self.sorted = sorted(self.stats)
+        for prompt in self.sorted:
+            self._update_top(prompt)
+    
+    @staticmethod
+    def normalize(prompt):
+        """The form prompts are counted and offered in, the same at startup and on add"""
+        return prompt.strip()
+    
+    def _count(self, prompt):
+        self.seq += 1
+        entry = self.stats.get(prompt)
+        if entry is None:
+            self.stats[prompt] = [1, self.seq]
+            return True
+        entry[0] += 1
+        entry[1] = self.seq
+        return False
+    
+    def score(self, prompt):
+        count, last_seen = self.stats[prompt]
+        return (count, last_seen)
+    
+    def _update_top(self, prompt):
+        score = self.score(prompt)
+        for length in range(len(prompt) + 1):
+            top = self.top.get(prompt[:length])
+            if top is None:
+                if length > self.TOP_PREFIX:
+                    continue
+                top = self.top[prompt[:length]] = []
+            if prompt in top:
+                top.remove(prompt)
+            elif len(top) >= self.limit and self.score(top[-1]) >= score:
+                continue
+            # Only this prompt's score changed, so a linear insert keeps the order
+            position = 0
+            while position < len(top) and self.score(top[position]) > score:
+                position += 1
+            top.insert(position, prompt)
+            del top[self.limit:]
+    
+    def add(self, prompt):
+        prompt = self.normalize(prompt)
+        if not prompt:
+            return
+        if self._count(prompt):
+            bisect.insort(self.sorted, prompt)
+        self._update_top(prompt)
+    
+    def complete(self, text, mode="prefix"):
+        """Return up to limit prompts matching text, best ranked first"""
+        if mode == "substring":
+            candidates = (prompt for prompt in self.stats if text in prompt)
+        elif mode == "fuzzy":
+            candidates = (prompt for prompt in self.stats if self._fuzzy_match(text, prompt))
+        elif text in self.top:
+            return list(self.top[text])
+        elif len(text) <= self.TOP_PREFIX:
+            return []
+        else:
+            low = bisect.bisect_left(self.sorted, text)
+            high = bisect.bisect_left(self.sorted, text[:-1] + chr(ord(text[-1]) + 1), low)
+            candidates = self.sorted[low:high]
+            if high - low > self.HEAVY_RANGE:
+                self.top[text] = heapq.nlargest(self.limit, candidates, key=self.score)
+                return list(self.top[text])
+        return heapq.nlargest(self.limit, candidates, key=self.score)
+    
+    @staticmethod
+    def _fuzzy_match(text, prompt):
+        """True when the characters of text appear in order in prompt"""
+        position = 0
+        for char in text:
+            position = prompt.find(char, position) + 1
+            if position == 0:
+                return False
+        return True
+
 class AutoCompleter:
-    def __init__(self, commands, history):
+    def __init__(self, commands, history, mode="prefix"):
         self.commands = commands
         self.history = history
+        self.mode = mode
         self.matches = []
+        self.index = PromptIndex(item["prompt"] for item in history.get())
+        history.subscribe(lambda item: self.index.add(item["prompt"]))
+        import readline
+        self.readline = readline
         readline.set_completer(self.complete)
         readline.parse_and_bind("tab: complete")
         readline.set_completer_delims(" \t\n")
     
     def complete(self, text, state):
         if state == 0:
-            line = readline.get_line_buffer()
+            line = self.readline.get_line_buffer()
             
             if line.startswith("/"):
-                options = [cmd for cmd in self.commands if cmd.startswith(text)]
+                self.matches = sorted(cmd for cmd in self.commands if cmd.startswith(text))
             else:
-                options = [item["prompt"] for item in self.history.get() if item["prompt"].startswith(text)]
-            
-            self.matches = sorted(options)
+                self.matches = self.index.complete(text, self.mode)
         
         try:
             return self.matches[state]
@@ -368,144 +1457,1724 @@ class AutoCompleter:
             return None
 
 class ResultFormatter:
-    def __init__(self, theme):
+    """
+    Long-lived markdown renderer shared by the whole session. It owns the
+    terminal console and an off-screen one the answers are rendered on,
+    looks up each Syntax lexer once per language and memoizes rendered code
+    blocks and tables per width, so the same output serves the live answer,
+    /show and repeated blocks.
+    """
+    _shared = None
+    MEMO_SIZE = 128
+    
+    def __init__(self, theme="default", width=None):
         self.theme = theme
-        self.console = Console() if RICH_AVAILABLE else None
+        self.width = width
+        self._console = None
+        self._renderer = None
+        self.lexers = {}
+        self.blocks = OrderedDict()
+        self.lock = threading.RLock()
+    
+    @classmethod
+    def shared(cls, config=None):
+        """Return the session formatter, creating it on first use"""
+        if cls._shared is None:
+            if config:
+                cls._shared = cls(config.get("theme", "default"), config.get("render_width"))
+            else:
+                cls._shared = cls()
+        return cls._shared
+    
+    @property
+    def console(self):
+        if self._console is None and RICH_AVAILABLE:
+            from rich.console import Console
+            self._console = Console(width=self.width)
+        return self._console
     
-    def format(self, text):
+    @property
+    def renderer(self):
+        """
+        Console the answers are captured on, with the terminal's colors. It is
+        never attached to a Live region, which would add the live renderable
+        and cursor moves to every capture.
+        """
+        if self._renderer is None and RICH_AVAILABLE:
+            import io
+            from rich.console import Console
+            console = self.console
+            self._renderer = Console(
+                file=io.StringIO(),
+                width=console.width,
+                force_terminal=console.is_terminal,
+                force_interactive=False,
+                color_system=console.color_system,
+                legacy_windows=console.legacy_windows,
+            )
+        return self._renderer
+    
+    def format(self, text, width=None):
         if not RICH_AVAILABLE:
             return text
-        text = re.sub(r'```(\w+)?\n(.*?)\n```', self._format_code, text, flags=re.DOTALL)
-        
-        if re.search(r'\|.*\|.*\|', text):
-            text = self._format_table(text)
-        try:
-            md = Markdown(text)
-            with self.console.capture() as capture:
-                self.console.print(md)
-            return capture.get()
-        except:
-            return text
+        with self.lock:
+            self.renderer.width = width or self.console.width
+            text = CODE_BLOCK.sub(self._format_code, text)
+            
+            if TABLE_ROW.search(text):
+                text = self._format_table(text)
+            try:
+                from rich.markdown import Markdown
+                return self._capture(Markdown(text))
+            except:
+                return text
+    
+    def _capture(self, renderable):
+        with self.renderer.capture() as capture:
+            self.renderer.print(renderable)
+        return capture.get()
+    
+    def _memoized(self, key, render):
+        """Return the cached rendering of a code block or table at the current width"""
+        key += (self.renderer.width,)
+        if key in self.blocks:
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+        rendered = self.blocks[key] = render()
+        if len(self.blocks) > self.MEMO_SIZE:
+            self.blocks.popitem(last=False)
+        return rendered
+    
+    def _lexer(self, language):
+        if language not in self.lexers:
+            from pygments.lexers import get_lexer_by_name
+            from pygments.util import ClassNotFound
+            try:
+                self.lexers[language] = get_lexer_by_name(language)
+            except ClassNotFound:
+                self.lexers[language] = get_lexer_by_name("text")
+        return self.lexers[language]
     
     def _format_code(self, match):
         language = match.group(1) or "text"
         code = match.group(2)
         
-        syntax = Syntax(code, language, theme="monokai", line_numbers=False)
-        with self.console.capture() as capture:
-            self.console.print(Panel(syntax, title=f"Code ({language})"))
-        return capture.get()
-    
-    def _format_table(self, text):
-        lines = text.split('\n')
-        table_lines = []
-        in_table = False
+        def render():
+            from rich.panel import Panel
+            from rich.syntax import Syntax
+            
+            syntax = Syntax(code, self._lexer(language), theme="monokai", line_numbers=False)
+            return self._capture(Panel(syntax, title=f"Code ({language})"))
         
-        for line in lines:
-            if '|' in line:
-                if not in_table:
-                    table = Table(title="Data Table")
-                    in_table = True
-                
-                cells = [cell.strip() for cell in line.split('|')[1:-1]]
+        return self._memoized(("code", language, code), render)
+    
+    def _render_table(self, rows):
+        def render():
+            from rich.table import Table
+            
+            table = Table(title="Data Table")
+            for cells in rows:
                 if not table.columns:
                     for cell in cells:
                         table.add_column(cell)
                 else:
                     table.add_row(*cells)
+            return self._capture(table)
+        
+        return self._memoized(("table",) + tuple(map(tuple, rows)), render)
+    
+    def _format_table(self, text):
+        table_lines = []
+        rows = []
+        
+        for line in text.split('\n'):
+            if '|' in line:
+                rows.append([cell.strip() for cell in line.split('|')[1:-1]])
             else:
-                if in_table:
-                    with self.console.capture() as capture:
-                        self.console.print(table)
-                    table_lines.append(capture.get())
-                    in_table = False
+                if rows:
+                    table_lines.append(self._render_table(rows))
+                    rows = []
                 table_lines.append(line)
         
-        if in_table:
-            with self.console.capture() as capture:
-                self.console.print(table)
-            table_lines.append(capture.get())
+        if rows:
+            table_lines.append(self._render_table(rows))
         
         return '\n'.join(table_lines)
+    
+    def stream(self, refresh_per_second=8):
+        """Return an incremental renderer to feed with tokens as they arrive"""
+        return StreamRenderer(self, refresh_per_second)
 
-class YOU:
+HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3",
+    "Connection": "keep-alive",
+    "Host": "you.com",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:136.0) Gecko/20100101 Firefox/136.0",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-User": "?1"
+}
+
+class StreamRenderer:
     """
-    Simple class that uses you.com service to scrap the answer of a given prompt
+    Incremental renderer fed with token chunks while an answer streams in.
+    Finished blocks (paragraphs, closed code fences, tables) are formatted once
+    and committed above a live region that only re-renders the trailing,
+    unfinished block, so the total rendering work stays linear in the answer.
+    The lock only guards the pending text: the live refresh takes it too, so
+    blocks are formatted and printed after it is released.
     """
-    def __init__(self, prompt, page=1, count=1, theme="default"):
-        self.prompt = prompt
-        self.page = page
-        self.count = count
-        self.theme = theme
-        self.formatter = ResultFormatter(theme)
+    def __init__(self, formatter, refresh_per_second=8):
+        self.formatter = formatter
+        self.refresh_per_second = refresh_per_second
+        self.block = []
+        self.partial = ""
+        self.in_fence = False
+        self.in_table = False
+        self.finished = []
+        self.lock = threading.Lock()
+        self.live = None
+        self.render_time = 0.0
     
-    def GenerateAnswer(self):
-        """
-        https://you.com/api/streamingSearch?q=qu%27est%20ce%20qu%27on%20entend%20par%20la%20comptabilit%C3%A9%20g%C3%A9n%C3%A9rale&page=1&count=1&safeSearch=Moderate&mkt=en-US&responseFilter=WebPages,Translations,TimeZone,Computation,RelatedSearches&domain=youchat&use_personalization_extraction=true
-        """
-        self.prompt = quote(self.prompt)
-        headers = {
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3",
-            "Connection": "keep-alive",
-            "Host": "you.com",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:136.0) Gecko/20100101 Firefox/136.0",
-            "Sec-Fetch-Dest": "document",
-            "Sec-Fetch-User": "?1"
-        }
+    def __enter__(self):
+        if self.formatter.console is not None:
+            from rich.live import Live
+            self.live = Live(
+                self,
+                console=self.formatter.console,
+                refresh_per_second=self.refresh_per_second,
+                transient=True,
+            )
+            self.live.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __rich_console__(self, console, options):
+        from rich.markdown import Markdown
         
-        API = f"https://you.com/api/streamingSearch?q={self.prompt}&page={self.page}&count={self.count}&safeSearch=Moderate&mkt=en-US&responseFilter=WebPages,Translations,TimeZone,Computation,RelatedSearches&domain=youchat&use_personalization_extraction=true"
+        with self.lock:
+            text = "\n".join(self.block + [self.partial])
+        if text.strip():
+            yield Markdown(text)
+    
+    def feed(self, chunk):
+        start = time.perf_counter()
+        if self.live is None:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        else:
+            with self.lock:
+                lines = (self.partial + chunk).split("\n")
+                self.partial = lines.pop()
+                for line in lines:
+                    self._add_line(line)
+            self._print_finished()
+        self.render_time += time.perf_counter() - start
+    
+    def _add_line(self, line):
+        stripped = line.strip()
         
-        try:
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                transient=True,
-            ) as progress:
-                task = progress.add_task("Searching...", total=None)
+        if self.in_fence:
+            self.block.append(line)
+            if stripped.startswith("```"):
+                self.in_fence = False
+                self._commit()
+            return
+        
+        if stripped.startswith("```"):
+            self._commit()
+            self.block.append(line)
+            self.in_fence = True
+            return
+        
+        is_table_row = stripped.startswith("|") and stripped.count("|") >= 2
+        if is_table_row != self.in_table:
+            self._commit()
+            self.in_table = is_table_row
+        
+        self.block.append(line)
+        if not stripped and not self.in_table:
+            self._commit()
+    
+    def _commit(self):
+        text = "\n".join(self.block)
+        self.block = []
+        if text.strip():
+            self.finished.append(text.strip("\n"))
+    
+    def _print_finished(self):
+        """Format and print the committed blocks, outside of the lock"""
+        from rich.text import Text
+        
+        with self.lock:
+            finished, self.finished = self.finished, []
+        for text in finished:
+            self.live.console.print(Text.from_ansi(self.formatter.format(text)))
+    
+    def close(self):
+        """Commit whatever is left and stop the live region"""
+        if self.live is None:
+            print()
+            return
+        
+        start = time.perf_counter()
+        with self.lock:
+            if self.partial:
+                self.block.append(self.partial)
+                self.partial = ""
+            self._commit()
+            self.in_fence = self.in_table = False
+        self._print_finished()
+        self.live.stop()
+        self.live = None
+        self.render_time += time.perf_counter() - start
+
+# Seconds spent opening connections (TCP + TLS) by the current thread
+CONNECT_TIMES = threading.local()
+
+def _timed_pool_classes():
+    """urllib3 pool classes whose connections report their connect time"""
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    
+    def timed(base):
+        class TimedConnection(base):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    CONNECT_TIMES.total = getattr(CONNECT_TIMES, "total", 0.0) + time.perf_counter() - start
+        return TimedConnection
+    
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = timed(HTTPConnection)
+    
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = timed(HTTPSConnection)
+    
+    return {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+class Flight:
+    """One upstream answer stream shared by every identical request made while it runs"""
+    def __init__(self):
+        self.tokens = []
+        self.results = None
+        self.error = None
+        self.done = False
+        self.condition = threading.Condition()
+    
+    def publish(self, token):
+        with self.condition:
+            self.tokens.append(token)
+            self.condition.notify_all()
+    
+    def finish(self, results, error):
+        with self.condition:
+            self.results = results
+            self.error = error
+            self.done = True
+            self.condition.notify_all()
+    
+    def follow(self, cancelled):
+        """Yield the tokens received so far, then each new one as it arrives"""
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.tokens) and not self.done:
+                    if cancelled.is_set():
+                        return
+                    self.condition.wait(0.1)
+                tokens = self.tokens[position:]
+                done = self.done
+            position += len(tokens)
+            yield from tokens
+            if done:
+                return
+
+class SingleFlight:
+    """
+    Registry of the requests currently streaming, keyed like the response
+    cache. The first caller for a key leads and fetches, later callers follow
+    its Flight until it finishes.
+    """
+    _shared = None
+    _lock = threading.Lock()
+    
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls):
+        """Return the process wide registry, daemon handler threads may race to create it"""
+        with cls._lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+    
+    def join(self, key):
+        """Return (flight, leader), leader is True for the caller that must fetch"""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self.flights[key] = Flight()
+            return flight, True
+    
+    def leave(self, key, flight, results, error):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.finish(results, error)
+
+class HTTPClient:
+    """
+    Pooled requests session shared by every YOU instance so that keep-alive
+    connections survive between prompts
+    """
+    _shared = None
+    _lock = threading.Lock()
+    
+    def __init__(self, pool_connections=4, pool_maxsize=10, max_retries=3, backoff_factor=0.5):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        retries = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+        )
+        # pool_block caps the open connections per host at pool_maxsize
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+            pool_block=True,
+        )
+        adapter.poolmanager.pool_classes_by_scheme = _timed_pool_classes()
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.ConnectTimeout = requests.ConnectTimeout
+        self.ReadTimeout = requests.ReadTimeout
+        self.RequestException = requests.RequestException
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_connections=config.get("pool_connections", 4),
+            pool_maxsize=config.get("pool_maxsize", 10),
+            max_retries=config.get("max_retries", 3),
+            backoff_factor=config.get("retry_backoff", 0.5),
+        )
+    
+    @classmethod
+    def shared(cls, config=None, light=False):
+        """
+        Return the process wide client, creating it on first use. With `light`
+        it is a LightHTTPClient whenever that can stand in for requests.
+        """
+        with cls._lock:
+            if cls._shared is None:
+                factory = LightHTTPClient if light and LightHTTPClient.usable() else cls
+                cls._shared = factory.from_config(config) if config else factory()
+            return cls._shared
+    
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+    
+    def close(self):
+        self.session.close()
+
+class LightResponse:
+    """The part of a streamed requests response that StreamAttempt reads"""
+    def __init__(self, connection, response):
+        self.connection = connection
+        self.raw = response
+        self.status_code = response.status
+        self.ok = response.status < 400
+    
+    def iter_content(self, chunk_size=None):
+        import http.client
+        import socket
+        
+        while True:
+            try:
+                chunk = self.raw.read1(chunk_size or 65536)
+            except socket.timeout as e:
+                raise LightHTTPClient.ReadTimeout(f"Read timed out. ({e})") from e
+            except (OSError, http.client.HTTPException) as e:
+                raise LightHTTPClient.RequestException(str(e)) from e
+            if not chunk:
+                return
+            yield chunk
+    
+    def close(self):
+        import socket
+        
+        # Shutting the socket down also wakes a read blocked in another thread
+        sock = self.connection.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.raw.close()
+        self.connection.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+class LightHTTPClient:
+    """
+    HTTPClient look-alike on http.client. Importing requests takes longer
+    than a one-shot query spends on its single request, so `-q -p` uses this
+    instead. Every request opens its own connection; retries follow the
+    urllib3 policy of HTTPClient (connection errors and RETRY_STATUSES,
+    exponential backoff, Retry-After).
+    """
+    class RequestException(IOError):
+        pass
+    
+    class ConnectTimeout(RequestException):
+        pass
+    
+    class ReadTimeout(RequestException):
+        pass
+    
+    PROXY_VARIABLES = ("http_proxy", "https_proxy", "all_proxy")
+    
+    def __init__(self, max_retries=3, backoff_factor=0.5):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._ssl_context = None
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_retries=config.get("max_retries", 3), backoff_factor=config.get("retry_backoff", 0.5))
+    
+    @classmethod
+    def usable(cls):
+        """Proxies are only supported through requests"""
+        return not any(key.lower() in cls.PROXY_VARIABLES and value for key, value in os.environ.items())
+    
+    def _connection(self, url, timeout):
+        import http.client
+        from urllib.parse import urlsplit
+        
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        if parts.scheme == "https":
+            if self._ssl_context is None:
+                import ssl
                 
-                reqApi = requests.get(API, headers=headers, timeout=20, allow_redirects=False)
-                progress.update(task, completed=True)
+                # Same CA bundle overrides as requests, the system store otherwise
+                self._ssl_context = ssl.create_default_context(cafile=os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or None)
+            connection = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=timeout, context=self._ssl_context)
+        else:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        return connection, path
+    
+    def _backoff(self, retry, response=None):
+        retry_after = response.getheader("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        return 0 if retry <= 1 else self.backoff_factor * 2 ** (retry - 1)
+    
+    def get(self, url, headers=None, timeout=None, allow_redirects=False, stream=True):
+        """Send a GET and return its response once the headers are in. Redirects are never followed."""
+        import http.client
+        import socket
+        
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        retry = 0
+        while True:
+            connection, path = self._connection(url, connect_timeout)
+            stage = "connect"
+            try:
+                start = time.perf_counter()
+                try:
+                    connection.connect()
+                finally:
+                    CONNECT_TIMES.total = getattr(CONNECT_TIMES, "total", 0.0) + time.perf_counter() - start
+                connection.sock.settimeout(read_timeout)
+                stage = "read"
+                connection.request("GET", path, headers=headers or {})
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                if retry >= self.max_retries:
+                    if isinstance(e, socket.timeout):
+                        raise (self.ConnectTimeout if stage == "connect" else self.ReadTimeout)(f"{url}: {e}") from e
+                    raise self.RequestException(f"{url}: {e}") from e
+                retry += 1
+                time.sleep(self._backoff(retry))
+                continue
             
-            if reqApi.ok:
-                sse_response = reqApi.text
-                paragraph = ""
-                events = sse_response.strip().split("\n\n")
-                
-                for event in events:
-                    if not event:
-                        continue
-                    
-                    event_lines = event.split("\n")
-                    event_type = None
-                    event_data = None
-                    
-                    for line in event_lines:
-                        if line.startswith("event:"):
-                            event_type = line.split("event:")[1].strip()
-                        elif line.startswith("data:"):
-                            event_data = line.split("data:")[1].strip()
-                    
-                    if event_type == "youChatToken" and event_data:
-                        try:
-                            data = json.loads(event_data)
-                            if "youChatToken" in data:
-                                paragraph += data["youChatToken"]
-                        except json.JSONDecodeError:
-                            pass
-                    
-                    elif event_type == "done":
+            if response.status in RETRY_STATUSES and retry < self.max_retries:
+                retry += 1
+                delay = self._backoff(retry, response)
+                response.close()
+                connection.close()
+                time.sleep(delay)
+                continue
+            return LightResponse(connection, response)
+    
+    def close(self):
+        pass
+
+class ResiliencePolicy:
+    """
+    Timeouts, hedging and resumption of the upstream requests. Once enough
+    queries were measured, the hedge delay becomes the p95 time to first
+    token and the read timeout four times its p99. At most `hedge_budget`
+    of the recent queries are hedged, so a slow upstream does not get
+    twice the load.
+    """
+    _shared = None
+    _lock = threading.Lock()
+    MIN_SAMPLES = 20
+    READ_TIMEOUT_FLOOR = 2.0
+    HEDGE_WINDOW = 100
+    
+    def __init__(self, connect_timeout=5, idle_timeout=20, hedge=True, hedge_delay=3.0, hedge_budget=0.05, max_resumes=2, metrics=None):
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.hedge = hedge
+        self.default_hedge_delay = hedge_delay
+        self.hedge_budget = hedge_budget
+        self.max_resumes = max_resumes
+        self.metrics = metrics
+        # One [hedged] slot per recent query
+        self.recent = deque(maxlen=self.HEDGE_WINDOW)
+        self.budget_lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config, metrics=None):
+        return cls(
+            connect_timeout=config.get("connect_timeout", 5),
+            idle_timeout=config.get("idle_timeout", 20),
+            hedge=config.get("hedge_requests", True),
+            hedge_delay=config.get("hedge_delay", 3.0),
+            hedge_budget=config.get("hedge_budget", 0.05),
+            max_resumes=config.get("max_resumes", 2),
+            metrics=metrics or Metrics.shared(config),
+        )
+    
+    @classmethod
+    def shared(cls, config=None):
+        with cls._lock:
+            if cls._shared is None:
+                cls._shared = cls.from_config(config) if config else cls()
+            return cls._shared
+    
+    def _ttft(self, fraction):
+        if self.metrics is None:
+            return None
+        return self.metrics.quantile("ttft", fraction, self.MIN_SAMPLES)
+    
+    def hedge_delay(self):
+        p95 = self._ttft(0.95)
+        return self.default_hedge_delay if p95 is None else p95
+    
+    def begin(self):
+        """Count a query sent upstream, the returned slot is passed to allow_hedge"""
+        slot = [False]
+        with self.budget_lock:
+            self.recent.append(slot)
+        return slot
+    
+    def allow_hedge(self, slot, limiter=None):
+        """
+        Whether the query of `slot` may send a duplicate request: the budget
+        allows at least one hedge in the window, and the duplicate also takes
+        a token from the batch rate limiter when there is one.
+        """
+        with self.budget_lock:
+            hedged = sum(1 for recent in self.recent if recent[0])
+            if hedged >= max(1, int(self.hedge_budget * len(self.recent))):
+                return False
+            if limiter is not None and not limiter.try_acquire():
+                return False
+            slot[0] = True
+            return True
+    
+    def read_timeout(self):
+        p99 = self._ttft(0.99)
+        if p99 is None:
+            return self.idle_timeout
+        return min(self.idle_timeout, max(self.READ_TIMEOUT_FLOOR, 4 * p99))
+
+class StreamAttempt(threading.Thread):
+    """
+    One upstream request for a YOU answer, read on its own thread so that a
+    hedged duplicate can race it. Tokens, results and the final (error,
+    failure) pair are put on the shared queue tagged with the attempt number.
+    A stream cut after an event id was seen is resumed with Last-Event-ID.
+    """
+    def __init__(self, you, number, events, policy):
+        super().__init__(daemon=True)
+        self.you = you
+        self.number = number
+        self.events = events
+        self.policy = policy
+        self.cancelled = threading.Event()
+        self.response = None
+        self.connect = self.ttfb = self.parse = 0.0
+        self.bytes = 0
+        self.resumes = 0
+        self.start()
+    
+    def cancel(self):
+        """Stop the attempt, closing its connection to unblock a pending read"""
+        self.cancelled.set()
+        response = self.response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+    
+    def run(self):
+        client = self.you.client
+        start = time.perf_counter()
+        parser = SSEParser()
+        error = failure = None
+        while not self.cancelled.is_set():
+            headers = HEADERS
+            if parser.last_event_id:
+                parser.reconnect()
+                headers = dict(HEADERS, **{"Last-Event-ID": parser.last_event_id})
+            try:
+                CONNECT_TIMES.total = 0.0
+                timeout = (self.policy.connect_timeout, self.policy.read_timeout())
+                with client.get(self.you._api_url(), headers=headers, timeout=timeout, allow_redirects=False, stream=True) as response:
+                    self.response = response
+                    if not self.ttfb:
+                        self.ttfb = time.perf_counter() - start
+                        self.connect = CONNECT_TIMES.total
+                    if not response.ok:
+                        error, failure = f"API request failed with status code {response.status_code}", "http"
                         break
+                    self._read(response, parser)
+                break
+            except client.ConnectTimeout:
+                error, failure = f"Connection timed out after {self.policy.connect_timeout}s", "connect_timeout"
+                break
+            except client.RequestException as e:
+                if self.cancelled.is_set():
+                    break
+                if not parser.last_event_id or self.resumes >= self.policy.max_resumes:
+                    # Read timeouts inside iter_content surface as a ConnectionError
+                    stalled = isinstance(e, client.ReadTimeout) or "Read timed out" in str(e)
+                    error = f"Stream stalled - {str(e)}" if stalled else f"Network request failed - {str(e)}"
+                    failure = "stalled" if stalled else "reset"
+                    break
+                self.resumes += 1
+            except Exception as e:
+                if not self.cancelled.is_set():
+                    error, failure = str(e), "error"
+                break
+            finally:
+                self.response = None
+        
+        if self.cancelled.is_set() and error is None:
+            error, failure = "Cancelled", "cancelled"
+        self.events.put((self.number, "end", (error, failure)))
+    
+    def _read(self, response, parser):
+        for chunk in response.iter_content(chunk_size=None):
+            if self.cancelled.is_set():
+                return
+            self.bytes += len(chunk)
+            if self._dispatch(parser.feed(chunk)):
+                return
+        self._dispatch(parser.close())
+    
+    def _dispatch(self, events):
+        """Handle parsed events, returning True once the done event is seen"""
+        step = time.perf_counter()
+        try:
+            for event_type, event_data in events:
+                if event_type == "done":
+                    return True
+                self._handle(event_type, event_data)
+            return False
+        finally:
+            self.parse += time.perf_counter() - step
+    
+    def _handle(self, event_type, event_data):
+        if event_type == "youChatToken" and event_data:
+            try:
+                token = json.loads(event_data).get("youChatToken")
+            except (json.JSONDecodeError, AttributeError):
+                return
+            if token:
+                self.events.put((self.number, "token", token))
+        
+        elif event_type in RESULT_EVENTS and event_data:
+            kind, record_class, payloads = RESULT_EVENTS[event_type]
+            try:
+                records = [record_class.from_payload(payload) for payload in payloads(json.loads(event_data))]
+            except (json.JSONDecodeError, AttributeError, TypeError):
+                return
+            self.events.put((self.number, "results", (kind, records)))
+
+class SSEParser:
+    """
+    Incremental text/event-stream parser following the WHATWG spec: lines end
+    in LF, CR or CRLF, repeated data fields are joined with LF, comments and
+    unknown fields are ignored and a blank line dispatches the event.
+    Chunks are appended to one bytearray; every complete line it holds is
+    decoded in a single pass and the buffer is trimmed once per chunk, so no
+    per-event copies are made.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.event_type = ""
+        self.data = []
+        self.last_event_id = ""
+        self.retry = None
+        self.pending_cr = False
+        self.started = False
+    
+    @classmethod
+    def parse(cls, data):
+        """Return every (type, data) pair of a complete, buffered stream"""
+        parser = cls()
+        return parser.feed(data) + parser.close()
+    
+    def feed(self, chunk):
+        """Consume a bytes-like chunk and return the (type, data) pairs it completed"""
+        if not chunk:
+            return []
+        # 13 is CR, tested as an int so that memoryviews are covered too
+        if self.pending_cr or 13 in chunk:
+            chunk = self._normalize(chunk)
+        
+        buffer = self.buffer
+        buffer += chunk
+        if not self.started:
+            # A leading UTF-8 BOM is dropped, possibly once more bytes arrive
+            if len(buffer) < 3 and BOM.startswith(bytes(buffer)):
+                return []
+            self.started = True
+            if buffer.startswith(BOM):
+                del buffer[:3]
+        
+        end = buffer.rfind(b"\n")
+        if end == -1:
+            return []
+        # Lines never split a UTF-8 sequence, so the region decodes as a whole
+        text = buffer[:end].decode("utf-8", "replace")
+        del buffer[:end + 1]
+        
+        events = []
+        data = self.data
+        for line in text.split("\n"):
+            if not line:
+                if data:
+                    events.append((self.event_type or "message", "\n".join(data)))
+                    data = self.data = []
+                self.event_type = ""
+            elif line.startswith("data:"):
+                data.append(line[6:] if line.startswith(" ", 5) else line[5:])
+            elif line.startswith("event:"):
+                self.event_type = line[7:] if line.startswith(" ", 6) else line[6:]
+            elif line[0] != ":":
+                self._field(line)
+        return events
+    
+    def close(self):
+        """Flush the end of the stream, dispatching an event left without its blank line"""
+        events = self.feed(b"\n") if self.pending_cr or self.buffer else []
+        if self.data:
+            events.append((self.event_type or "message", "\n".join(self.data)))
+        self.event_type = ""
+        self.data = []
+        return events
+    
+    def reconnect(self):
+        """Drop the event cut by a lost connection, keeping the last event id"""
+        self.buffer.clear()
+        self.event_type = ""
+        self.data = []
+        self.pending_cr = False
+        self.started = False
+    
+    def _normalize(self, chunk):
+        # A CR ending the chunk may be the first half of a CRLF
+        chunk = bytes(chunk)
+        if self.pending_cr:
+            chunk = b"\r" + chunk
+        self.pending_cr = chunk.endswith(b"\r")
+        if self.pending_cr:
+            chunk = chunk[:-1]
+        return chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    
+    def _field(self, line):
+        name, colon, value = line.partition(":")
+        if colon and value.startswith(" "):
+            value = value[1:]
+        if name == "data":
+            self.data.append(value)
+        elif name == "event":
+            self.event_type = value
+        elif name == "id":
+            if "\0" not in value:
+                self.last_event_id = value
+        elif name == "retry":
+            if value.isdigit():
+                self.retry = int(value)
+
+def iter_sse_events(chunks):
+    """
+    Incrementally parse an SSE byte stream into (type, data) pairs.
+    Only the event currently being received is kept in memory.
+    """
+    parser = SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+class RequestTimings:
+    """Where the time of one query went, durations are in seconds"""
+    __slots__ = ("timestamp", "connect", "ttfb", "ttft", "total", "parse", "render", "bytes", "tokens", "resumes", "cached", "coalesced", "hedged", "error")
+    DURATIONS = ("connect", "ttfb", "ttft", "total", "parse", "render")
+    
+    def __init__(self):
+        self.timestamp = time.time()
+        self.connect = self.ttfb = self.ttft = self.total = self.parse = self.render = 0.0
+        self.bytes = self.tokens = self.resumes = 0
+        self.cached = False
+        self.coalesced = False
+        self.hedged = False
+        self.error = False
+    
+    def to_dict(self):
+        record = {slot: getattr(self, slot) for slot in self.__slots__}
+        for name in self.DURATIONS:
+            record[name] = round(record[name], 6)
+        return record
+
+class Metrics:
+    """
+    Ring buffer of the last RequestTimings with percentile summaries,
+    optionally mirrored to a file as JSON lines or in Prometheus text format
+    """
+    _shared = None
+    FIELDS = RequestTimings.DURATIONS + ("bytes", "tokens")
+    
+    def __init__(self, size=1000, path=None, output_format="jsonl"):
+        self.records = deque(maxlen=size)
+        self.path = path
+        self.output_format = output_format
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        path = config.get("metrics_file")
+        return cls(config.get("metrics_buffer", 1000), os.path.expanduser(path) if path else None, config.get("metrics_format", "jsonl"))
+    
+    @classmethod
+    def shared(cls, config=None):
+        """Return the process wide metrics, creating them on first use"""
+        if cls._shared is None:
+            cls._shared = cls.from_config(config) if config else cls()
+        return cls._shared
+    
+    def record(self, timings):
+        with self.lock:
+            self.records.append(timings)
+        if self.path:
+            try:
+                self._emit(timings)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def percentile(values, fraction):
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+    
+    def summary(self, fractions=(0.5, 0.95, 0.99)):
+        """Return {field: [p50, p95, p99]} over the buffered queries, plus counts"""
+        with self.lock:
+            records = list(self.records)
+        summary = {
+            "count": len(records),
+            "errors": sum(1 for record in records if record.error),
+            "cached": sum(1 for record in records if record.cached),
+            "coalesced": sum(1 for record in records if record.coalesced),
+            "hedged": sum(1 for record in records if record.hedged),
+        }
+        if not records:
+            return summary
+        for field in self.FIELDS:
+            values = sorted(getattr(record, field) for record in records)
+            summary[field] = [self.percentile(values, fraction) for fraction in fractions]
+        return summary
+    
+    def quantile(self, field, fraction, min_samples=1):
+        """Percentile of a field over the fetched, successful queries, None below min_samples"""
+        with self.lock:
+            values = sorted(getattr(record, field) for record in self.records
+                            if not (record.cached or record.coalesced or record.error))
+        if len(values) < min_samples:
+            return None
+        return self.percentile(values, fraction)
+    
+    def _emit(self, timings):
+        if self.output_format != "prometheus":
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(timings.to_dict()) + "\n")
+            return
+        
+        # Textfile collector style: the whole file is replaced atomically
+        summary = self.summary()
+        lines = [
+            "# TYPE nice_youc0m_queries gauge",
+            f"nice_youc0m_queries {summary['count']}",
+            "# TYPE nice_youc0m_errors gauge",
+            f"nice_youc0m_errors {summary['errors']}",
+        ]
+        for field in self.FIELDS:
+            name = f"nice_youc0m_{field}_seconds" if field in RequestTimings.DURATIONS else f"nice_youc0m_{field}"
+            lines.append(f"# TYPE {name} summary")
+            for quantile, value in zip(("0.5", "0.95", "0.99"), summary[field]):
+                lines.append(f'{name}{{quantile="{quantile}"}} {value}')
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+class Source:
+    """A web page returned alongside the answer"""
+    __slots__ = ("url", "name", "snippet")
+    
+    def __init__(self, url, name=None, snippet=None):
+        self.url = url
+        self.name = name
+        self.snippet = snippet
+    
+    @classmethod
+    def from_payload(cls, data):
+        if isinstance(data, dict) and data.get("url"):
+            return cls(data["url"], data.get("name") or data.get("title"), data.get("snippet") or data.get("description"))
+        return None
+    
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    def __str__(self):
+        return f"{self.name or self.url}\n    {self.url}"
+
+class RelatedSearch:
+    """A follow-up query suggested by you.com"""
+    __slots__ = ("query",)
+    
+    def __init__(self, query):
+        self.query = query
+    
+    @classmethod
+    def from_payload(cls, data):
+        if isinstance(data, dict):
+            data = data.get("text") or data.get("query")
+        return cls(data) if isinstance(data, str) and data else None
+    
+    def to_dict(self):
+        return {"query": self.query}
+    
+    def __str__(self):
+        return self.query
+
+class Computation:
+    """The result of a calculator or unit conversion widget"""
+    __slots__ = ("expression", "result")
+    
+    def __init__(self, expression, result):
+        self.expression = expression
+        self.result = result
+    
+    @classmethod
+    def from_payload(cls, data):
+        if isinstance(data, dict) and data.get("result") is not None:
+            return cls(data.get("expression") or data.get("input"), str(data["result"]))
+        return None
+    
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    def __str__(self):
+        return f"{self.expression} = {self.result}" if self.expression else self.result
+
+class SearchResults:
+    """Structured, non-token records of one answer, grouped by kind"""
+    __slots__ = ("sources", "related", "computations")
+    KINDS = {"sources": Source, "related": RelatedSearch, "computations": Computation}
+    LABELS = {"sources": "sources", "related": "related searches", "computations": "computations"}
+    
+    def __init__(self):
+        self.sources = []
+        self.related = []
+        self.computations = []
+    
+    def add(self, kind, records):
+        getattr(self, kind).extend(record for record in records if record is not None)
+    
+    def __bool__(self):
+        return any(getattr(self, kind) for kind in self.KINDS)
+    
+    def summary(self):
+        return " · ".join(f"{len(getattr(self, kind))} {self.LABELS[kind]}" for kind in self.KINDS if getattr(self, kind))
+    
+    def to_dict(self):
+        return {kind: [record.to_dict() for record in getattr(self, kind)] for kind in self.KINDS if getattr(self, kind)}
+    
+    @classmethod
+    def from_dict(cls, data):
+        results = cls()
+        for kind, record_class in cls.KINDS.items():
+            for record in (data or {}).get(kind, []):
+                getattr(results, kind).append(record_class(**record))
+        return results
+
+# Non-token events, mapped to the kind of record and the payloads they carry
+RESULT_EVENTS = {
+    "searchResults": ("sources", Source, lambda data: data.get("youChatSerpResults", [])),
+    "thirdPartySearchResults": ("sources", Source, lambda data: data.get("search", {}).get("third_party_search_results", [])),
+    "relatedSearches": ("related", RelatedSearch, lambda data: data.get("relatedSearches", [])),
+    "computation": ("computations", Computation, lambda data: [data.get("computation", data)]),
+}
+
+class YOU:
+    """
+    Simple class that uses you.com service to scrap the answer of a given prompt
+    """
+    def __init__(self, prompt, page=1, count=1, theme="default", client=None, api_url=API_URL, cache=None, mkt="en-US", safe_search="Moderate", response_filter=RESPONSE_FILTER, flights=None, chat="", policy=None, limiter=None):
+        self.prompt = prompt
+        self.page = page
+        self.count = count
+        self.theme = theme
+        self.client = client or HTTPClient.shared()
+        self.api_url = api_url
+        self.cache = cache
+        self.mkt = mkt
+        self.safe_search = safe_search
+        self.response_filter = response_filter
+        self.flights = flights
+        self.chat = chat
+        self.policy = policy or ResiliencePolicy()
+        self.limiter = limiter
+        self._formatter = None
+        self.answer = ""
+        self.error = None
+        self.failure = None
+        self.cached = False
+        self.coalesced = False
+        self.latency = 0.0
+        self.bytes_received = 0
+        self.timings = RequestTimings()
+        self.results = SearchResults()
+        self.cancelled = threading.Event()
+    
+    @property
+    def formatter(self):
+        if self._formatter is None:
+            self._formatter = ResultFormatter.shared()
+        return self._formatter
+    
+    def _api_url(self):
+        url = f"{self.api_url}?q={quote(self.prompt)}&page={self.page}&count={self.count}&safeSearch={self.safe_search}&mkt={self.mkt}&responseFilter={quote(self.response_filter, safe=',')}&domain=youchat&use_personalization_extraction=true"
+        # chat is already URL quoted by ChatContext
+        return f"{url}&chat={self.chat}" if self.chat else url
+    
+    def StreamAnswer(self):
+        """
+        Yield the answer tokens as they arrive, stopping at the done event.
+        The full text is available in self.answer once the generator is exhausted,
+        failures are reported through self.error and classified in self.failure.
+        """
+        self.answer = ""
+        self.error = None
+        self.failure = None
+        self.cached = False
+        self.coalesced = False
+        self.bytes_received = 0
+        self.results = SearchResults()
+        self.timings = timings = RequestTimings()
+        start = time.perf_counter()
+        tokens = []
+        
+        cache_key = None
+        if self.cache is not None or self.flights is not None:
+            cache_key = ResponseCache.key(self.prompt, self.page, self.count, self.mkt, self.safe_search, self.response_filter, self.chat)
+        if self.cache is not None:
+            hit = self.cache.get(cache_key)
+            if hit is not None:
+                hit, results = hit
+                self.cached = True
+                self.answer = hit
+                self.results = SearchResults.from_dict(results)
+                self.latency = timings.total = timings.ttfb = timings.ttft = time.perf_counter() - start
+                timings.cached = True
+                timings.tokens = 1
+                yield hit
+                return
+        
+        if self.cancelled.is_set():
+            self.error, self.failure = "Cancelled", "cancelled"
+            timings.error = True
+            return
+        
+        # Identical requests already in flight are followed instead of re-sent
+        flight, leader = self.flights.join(cache_key) if self.flights is not None else (None, True)
+        attempts = []
+        complete = False
+        try:
+            if not leader:
+                self.coalesced = timings.coalesced = True
+                for token in flight.follow(self.cancelled):
+                    if not tokens:
+                        timings.ttft = time.perf_counter() - start
+                    tokens.append(token)
+                    yield token
+                if not flight.done:
+                    self.error, self.failure = "Cancelled", "cancelled"
+                else:
+                    self.error, self.failure = flight.error
+                self.results = flight.results or self.results
+                return
+            
+            policy = self.policy
+            events = queue.Queue()
+            attempts.append(StreamAttempt(self, 0, events, policy))
+            slot = policy.begin()
+            hedge_at = start + policy.hedge_delay() if policy.hedge else None
+            winner = None
+            finished = set()
+            results = {}
+            
+            idle_at = start + policy.idle_timeout
+            while True:
+                if self.cancelled.is_set():
+                    self.error, self.failure = "Cancelled", "cancelled"
+                    break
+                hedging = winner is None and hedge_at is not None and len(attempts) == 1
+                deadline = min(hedge_at, idle_at) if hedging else idle_at
+                try:
+                    # Short slices keep cancellation responsive while waiting
+                    number, kind, payload = events.get(timeout=min(0.1, max(0.0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    now = time.perf_counter()
+                    if now < deadline:
+                        continue
+                    if hedging and now < idle_at:
+                        # No first token after the usual p95: race a duplicate request, budget permitting
+                        if policy.allow_hedge(slot, self.limiter):
+                            attempts.append(StreamAttempt(self, 1, events, policy))
+                            timings.hedged = True
+                        hedge_at = None
+                        continue
+                    self.error, self.failure = f"Stream stalled: no data for {policy.idle_timeout:g}s", "stalled"
+                    break
                 
-                formatted_response = self.formatter.format(paragraph.strip())
-                return formatted_response
-            else:
-                return colored(f"Error: API request failed with status code {reqApi.status_code}", "red")
+                if winner is not None and number != winner:
+                    continue
+                
+                idle_at = time.perf_counter() + policy.idle_timeout
+                if kind == "token":
+                    if winner is None:
+                        # The first attempt to produce a token wins, the others are dropped
+                        winner = number
+                        for attempt in attempts:
+                            if attempt.number != winner:
+                                attempt.cancel()
+                        timings.ttft = time.perf_counter() - start
+                    tokens.append(payload)
+                    if flight is not None:
+                        flight.publish(payload)
+                    yield payload
+                
+                elif kind == "results":
+                    results.setdefault(number, SearchResults()).add(*payload)
+                
+                elif kind == "end":
+                    finished.add(number)
+                    if winner is None and len(finished) < len(attempts):
+                        continue
+                    self.error, self.failure = payload
+                    winner = number if winner is None else winner
+                    break
+            
+            complete = True
+            chosen = attempts[winner if winner is not None else 0]
+            self.results = results.get(chosen.number, self.results)
+            timings.connect, timings.ttfb, timings.parse = chosen.connect, chosen.ttfb, chosen.parse
+            timings.resumes = chosen.resumes
+            
+            self.answer = "".join(tokens).strip()
+            if self.cache is not None and self.answer and not self.error:
+                self.cache.set(cache_key, self.answer, self.results.to_dict())
         
-        except requests.RequestException as e:
-            return colored(f"Error: Network request failed - {str(e)}", "red")
         except Exception as e:
-            return colored(f"Error: {str(e)}", "red")
+            self.error, self.failure = str(e), "error"
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            if leader and not complete and not self.error:
+                # The consumer stopped reading early, followers must not take the partial answer as done
+                self.error, self.failure = "Cancelled", "cancelled"
+            self.answer = "".join(tokens).strip()
+            self.bytes_received = sum(attempt.bytes for attempt in attempts)
+            self.latency = timings.total = time.perf_counter() - start
+            timings.bytes = self.bytes_received
+            timings.tokens = len(tokens)
+            timings.error = bool(self.error)
+            if leader and flight is not None:
+                self.flights.leave(cache_key, flight, self.results, (self.error, self.failure))
+    
+    @property
+    def sources(self):
+        return self.results.sources
+    
+    def cancel(self):
+        """Stop reading the stream at the next event, from any thread"""
+        self.cancelled.set()
+    
+    def meta(self):
+        """Request metadata stored alongside the raw answer in the history"""
+        return {
+            "latency": round(self.latency, 3),
+            "bytes": self.bytes_received,
+            "page": self.page,
+            "count": self.count,
+            "cached": self.cached,
+            "coalesced": self.coalesced,
+            "failure": self.failure,
+        }
+    
+    def GenerateAnswer(self):
+        """
+        https://you.com/api/streamingSearch?q=qu%27est%20ce%20qu%27on%20entend%20par%20la%20comptabilit%C3%A9%20g%C3%A9n%C3%A9rale&page=1&count=1&safeSearch=Moderate&mkt=en-US&responseFilter=WebPages,Translations,TimeZone,Computation,RelatedSearches&domain=youchat&use_personalization_extraction=true
+        """
+        if not RICH_AVAILABLE:
+            for _ in self.StreamAnswer():
+                pass
+            return colored(f"Error: {self.error}", "red") if self.error else self.answer
+        
+        from rich.progress import Progress, SpinnerColumn, TextColumn
+        
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            transient=True,
+        ) as progress:
+            task = progress.add_task("Searching...", total=None)
+            for _ in self.StreamAnswer():
+                pass
+            progress.update(task, completed=True)
+        
+        if self.error:
+            return colored(f"Error: {self.error}", "red")
+        start = time.perf_counter()
+        answer = self.formatter.format(self.answer)
+        self.timings.render = time.perf_counter() - start
+        return answer
+
+class MultiPageFetcher:
+    """
+    Fetch pages 1..N of the same prompt concurrently and merge them in page
+    order, keeping only the first occurrence of every source URL. Once the
+    finished leading pages hold max_results unique sources, the later pages
+    still running are cancelled.
+    """
+    def __init__(self, prompt, pages, count=1, max_results=None, **options):
+        self.prompt = prompt
+        self.pages = max(1, pages)
+        self.max_results = max_results
+        self.lock = threading.Lock()
+        self.finished = set()
+        self.yous = [YOU(prompt, page, count, **options) for page in range(1, self.pages + 1)]
+    
+    def _fetch(self, you):
+        for _ in you.StreamAnswer():
+            pass
+        if self.max_results:
+            with self.lock:
+                self.finished.add(you.page)
+                self._cancel_if_enough()
+        return you
+    
+    def _cancel_if_enough(self):
+        urls = set()
+        for position, you in enumerate(self.yous):
+            if you.page not in self.finished:
+                return
+            urls.update(source.url for source in you.sources)
+            if len(urls) >= self.max_results:
+                for later in self.yous[position + 1:]:
+                    later.cancel()
+                return
+    
+    def fetch(self, on_page=None):
+        """
+        Run every page and return the merged answer and SearchResults, on_page
+        is called with each page in order as soon as it and the previous ones are done
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        answers, results, urls, queries = [], SearchResults(), set(), set()
+        with ThreadPoolExecutor(max_workers=self.pages) as executor:
+            futures = [executor.submit(self._fetch, you) for you in self.yous]
+            for future in futures:
+                you = future.result()
+                if on_page:
+                    on_page(you)
+                if you.error:
+                    continue
+                if you.answer:
+                    answers.append((you.page, you.answer))
+                for source in you.sources:
+                    if source.url not in urls:
+                        urls.add(source.url)
+                        results.sources.append(source)
+                for related in you.results.related:
+                    if related.query not in queries:
+                        queries.add(related.query)
+                        results.related.append(related)
+                if not results.computations:
+                    results.computations = you.results.computations
+        
+        if self.max_results:
+            results.sources = results.sources[:self.max_results]
+        if len(answers) == 1:
+            answer = answers[0][1]
+        else:
+            answer = "\n\n".join(f"### Page {page}\n\n{text}" for page, text in answers)
+        return answer, results
+
+class RateLimiter:
+    """
+    Token bucket shared by every batch worker, rate is in requests per second.
+    Hedged requests take their token from the worker threads with try_acquire.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = None
+        self.bucket_lock = threading.Lock()
+    
+    def _take(self):
+        """Take a token if one is available, otherwise return the seconds until there is"""
+        with self.bucket_lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+    
+    def try_acquire(self):
+        return self.rate <= 0 or self._take() == 0
+    
+    async def acquire(self):
+        import asyncio
+        
+        if self.rate <= 0:
+            return
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                wait = self._take()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+def read_batch(path):
+    """
+    Yield (line number, item) pairs from a file (or stdin for "-"), one prompt
+    per line. Lines starting with "{" are read as JSON objects with a "prompt"
+    key and optional "page"/"count" overrides. Lines that cannot be used are
+    yielded as an item with an "error" so they still get a record.
+    """
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield index, {"error": f"Invalid JSON: {e}"}
+                    continue
+                if not isinstance(item, dict) or not item.get("prompt"):
+                    yield index, {"error": "Missing prompt"}
+                    continue
+                yield index, item
+            else:
+                yield index, {"prompt": line}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+class BatchRunner:
+    """
+    Answer many prompts concurrently and write one JSON line per result as
+    soon as it completes. In pipe mode the records carry the sources and
+    timings instead of the full results.
+    """
+    def __init__(self, output, page=1, count=1, concurrency=8, rate=0, timeout=60, client=None, pipe=False, **options):
+        self.output = output
+        self.pipe = pipe
+        self.page = page
+        self.count = count
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.timeout = timeout
+        self.client = client or HTTPClient.shared()
+        self.options = options
+        self.stats = {"ok": 0, "failed": 0}
+        self.broken = False
+    
+    def _fetch(self, you, started):
+        started()
+        for _ in you.StreamAnswer():
+            pass
+        return you
+    
+    async def _answer(self, index, item, executor):
+        import asyncio
+        
+        loop = asyncio.get_running_loop()
+        you = YOU(item["prompt"], item.get("page", self.page), item.get("count", self.count), client=self.client, limiter=self.limiter, **self.options)
+        record = {"index": index, "prompt": item["prompt"]}
+        start = time.perf_counter()
+        
+        try:
+            await self.limiter.acquire()
+            # The timeout runs from the moment a worker picks the prompt up
+            started = asyncio.Event()
+            future = loop.run_in_executor(executor, self._fetch, you, lambda: loop.call_soon_threadsafe(started.set))
+            await started.wait()
+            you = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            record["answer"] = you.answer
+            if self.pipe:
+                record["sources"] = [source.to_dict() for source in you.sources]
+                record["timings"] = you.timings.to_dict()
+            elif you.results:
+                record["results"] = you.results.to_dict()
+            record["error"] = you.error
+            Metrics.shared().record(you.timings)
+        except asyncio.TimeoutError:
+            # The stream loop notices within 0.1s, the worker is free again before the slot is
+            you.cancel()
+            await future
+            record["answer"] = ""
+            record["error"] = f"Timed out after {self.timeout}s"
+        
+        record["elapsed"] = round(time.perf_counter() - start, 3)
+        self._write(record)
+    
+    def _write(self, record):
+        self.stats["failed" if record["error"] else "ok"] += 1
+        if self.broken:
+            return
+        try:
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.output.flush()
+        except BrokenPipeError:
+            self.broken = True
+    
+    async def run(self, items):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        
+        loop = asyncio.get_running_loop()
+        self.limiter = RateLimiter(self.rate)
+        slots = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        items = iter(items)
+        
+        def release(task):
+            pending.discard(task)
+            slots.release()
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor, ThreadPoolExecutor(max_workers=1) as reader:
+            # Items are pulled lazily, and only once a slot is free, so that huge
+            # inputs are never fully in memory. Reading happens off the event loop
+            # so a slow producer on stdin does not hold back finished answers.
+            while not self.broken:
+                await slots.acquire()
+                entry = await loop.run_in_executor(reader, next, items, None)
+                if entry is None:
+                    slots.release()
+                    break
+                index, item = entry
+                if "error" in item:
+                    # Unusable input lines are reported in place, nothing is sent upstream
+                    self._write({"index": index, "prompt": None, "answer": "", "error": item["error"], "elapsed": 0.0})
+                    slots.release()
+                    continue
+                task = asyncio.ensure_future(self._answer(index, item, executor))
+                pending.add(task)
+                task.add_done_callback(release)
+            if pending:
+                await asyncio.gather(*pending)
+        
+        if self.broken:
+            raise BrokenPipeError("output closed")
+        return self.stats
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """
+    One client connection: a single JSON request line, answered with one
+    {"token": ...} line per token and a final {"done": true, ...} record.
+    The ops are ask (the default), ping and shutdown.
+    """
+    def _send(self, message):
+        self.wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.wfile.flush()
+    
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            self._send({"done": True, "error": "Invalid request"})
+            return
+        
+        op = request.get("op", "ask")
+        if op == "ping":
+            self._send({"done": True})
+        elif op == "shutdown":
+            self._send({"done": True, "error": None})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif op == "ask" and request.get("prompt"):
+            self._ask(request)
+        else:
+            self._send({"done": True, "error": f"Unsupported request: {op}"})
+    
+    def _ask(self, request):
+        daemon = self.server
+        you = YOU(
+            request["prompt"], request.get("page", 1), request.get("count", 1),
+            **you_options(daemon.config, daemon.cache, request.get("response_filter"))
+        )
+        stream = you.StreamAnswer()
+        try:
+            for token in stream:
+                self._send({"token": token})
+        except OSError:
+            # The client went away, stop reading upstream
+            you.cancel()
+        finally:
+            stream.close()
+        
+        try:
+            self._send({
+                "done": True,
+                "answer": you.answer,
+                "error": you.error,
+                "sources": [source.to_dict() for source in you.sources],
+                "meta": you.meta(),
+            })
+        except OSError:
+            pass
+        
+        # Stored once the client has its answer, the fsync is off its critical path
+        Metrics.shared().record(you.timings)
+        daemon.history.add(request["prompt"], you.answer, you.meta(), you.results.to_dict() or None, you.error)
+
+# Platforms without Unix sockets get a placeholder base, run_daemon refuses to start there
+class Daemon(socketserver.ThreadingMixIn, getattr(socketserver, "UnixStreamServer", socketserver.TCPServer)):
+    """
+    Warm process serving prompts over a Unix socket. It keeps the config,
+    history, search index, connection pool, cache and formatter loaded so
+    that each CLI call only pays for a socket round trip.
+    """
+    daemon_threads = True
+    
+    def __init__(self, config, path=DAEMON_SOCKET):
+        self.config = config
+        self.path = path
+        self.history = History(max_items=config.get("max_history", 100), archive=config.get("archive_history", True))
+        self.search = SearchIndex()
+        self.history.subscribe(self.search.add)
+        self.cache = ResponseCache.from_config(config) if config.get("cache_enabled", True) else None
+        HTTPClient.shared(config)
+        ResultFormatter.shared(config)
+        
+        if os.path.exists(path):
+            if daemon_request({"op": "ping"}, path) is not None:
+                raise OSError(f"A daemon is already listening on {path}")
+            os.unlink(path)
+        super().__init__(path, DaemonHandler)
+        os.chmod(path, 0o600)
+    
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+def daemon_request(request, path=DAEMON_SOCKET, on_token=None):
+    """
+    Send one request to the daemon, calling on_token for each streamed token.
+    Returns the final record, or None when no daemon is listening.
+    """
+    import socket
+    
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        for line in replies:
+            message = json.loads(line)
+            if "token" in message:
+                if on_token:
+                    on_token(message["token"])
+            elif message.get("done"):
+                return message
+    return {"done": True, "error": "Connection closed by the daemon"}
+
+def render_banner(font):
+    """Return the Figlet banner, rendered once per font and cached on disk"""
+    cache_file = os.path.join(CONFIG_DIR, f"banner_{font}.txt")
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        pass
+    
+    from pyfiglet import Figlet
+    banner_text = Figlet(font=font).renderText('YOU.COM SCRAPER')
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            f.write(banner_text)
+    except OSError:
+        pass
+    return banner_text
 
 def display_banner(theme):
     """Display a random colored banner"""
@@ -513,8 +3182,7 @@ def display_banner(theme):
     banner_color = theme_colors["primary"]
     
     if FIGLET_AVAILABLE and TERMCOLOR_AVAILABLE:
-        f = Figlet(font=theme_colors["banner"])
-        banner_text = f.renderText('YOU.COM SCRAPER')
+        banner_text = render_banner(theme_colors["banner"])
         print(colored(banner_text, banner_color))
         print(colored("=" * 60, banner_color))
         print(colored("A feature-rich web scraper for you.com\nBy Ousax", banner_color))
@@ -529,29 +3197,239 @@ def display_banner(theme):
         print("Press Ctrl+C to exit")
         print("=" * 60)
 
+def you_options(config, cache=None, response_filter=None, context=None):
+    """Keyword arguments for YOU taken from the configuration"""
+    return {
+        "chat": context.encoded() if context is not None else "",
+        "theme": config.get("theme", "default"),
+        "api_url": config.get("api_url", API_URL),
+        "cache": cache,
+        "mkt": config.get("mkt", "en-US"),
+        "safe_search": config.get("safe_search", "Moderate"),
+        "response_filter": config.get("response_filter", RESPONSE_FILTER) if response_filter is None else response_filter,
+        "flights": SingleFlight.shared() if config.get("coalesce_requests", True) else None,
+        "policy": ResiliencePolicy.shared(config),
+    }
+
+def ask(prompt, args, config, history, cache=None, context=None):
+    """Answer a prompt, printing tokens live in streaming mode"""
+    you = YOU(prompt, args.page, args.results, **you_options(config, cache, args.response_filter, context))
+    
+    if args.quiet:
+        # Plain output for scripts: no header, no spinner, no Rich rendering
+        for token in you.StreamAnswer():
+            if args.stream:
+                sys.stdout.write(token)
+                sys.stdout.flush()
+        print("" if args.stream else you.answer)
+        if you.error:
+            print(f"Error: {you.error}", file=sys.stderr)
+    elif args.stream:
+        print(colored("\n🤖 YOU.COM:", "cyan"))
+        with you.formatter.stream() as renderer:
+            for token in you.StreamAnswer():
+                renderer.feed(token)
+        you.timings.render = renderer.render_time
+        if you.error:
+            print(colored(f"Error: {you.error}", "red"))
+    else:
+        answer = you.GenerateAnswer()
+        print(colored("\n🤖 YOU.COM:", "cyan"))
+        print(answer)
+    
+    if you.results and not args.quiet:
+        print(colored(f"📚 {you.results.summary()} (/results to expand)", "blue"))
+    Metrics.shared().record(you.timings)
+    history.add(prompt, you.answer, you.meta(), you.results.to_dict() or None, you.error)
+    return you
+
+def ask_pages(prompt, args, config, history, cache=None, context=None):
+    """Answer a prompt from several result pages fetched concurrently"""
+    fetcher = MultiPageFetcher(prompt, args.pages, args.results, args.max_results, **you_options(config, cache, args.response_filter, context))
+    start = time.perf_counter()
+    
+    def show_page(you):
+        if you.error == "Cancelled":
+            return
+        Metrics.shared().record(you.timings)
+        if args.quiet:
+            print(you.answer if not you.error else "", flush=True)
+            return
+        print(colored(f"\n🤖 YOU.COM (page {you.page}):", "cyan"))
+        render = time.perf_counter()
+        print(colored(f"Error: {you.error}", "red") if you.error else you.formatter.format(you.answer))
+        you.timings.render = time.perf_counter() - render
+    
+    answer, results = fetcher.fetch(show_page)
+    if results.sources and not args.quiet:
+        print(colored("\nSources:", "blue"))
+        for i, source in enumerate(results.sources, 1):
+            print(f"[{i}] {source}")
+    
+    meta = {
+        "latency": round(time.perf_counter() - start, 3),
+        "bytes": sum(you.bytes_received for you in fetcher.yous),
+        "page": 1,
+        "count": args.results,
+        "pages": args.pages,
+    }
+    history.add(prompt, answer, meta, results.to_dict() or None, None if answer else "no page could be fetched")
+    return answer
+
+def run_batch(args, config):
+    client = HTTPClient(
+        pool_connections=config.get("pool_connections", 4),
+        pool_maxsize=max(config.get("pool_maxsize", 10), args.concurrency),
+        max_retries=config.get("max_retries", 3),
+        backoff_factor=config.get("retry_backoff", 0.5),
+    )
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    cache = ResponseCache.from_config(config) if config.get("cache_enabled", True) else None
+    runner = BatchRunner(
+        output, args.page, args.results, args.concurrency, args.rate, args.timeout, client, args.pipe,
+        **you_options(config, cache, args.response_filter)
+    )
+    
+    import asyncio
+    
+    try:
+        stats = asyncio.run(runner.run(read_batch("-" if args.pipe else args.batch)))
+    except KeyboardInterrupt:
+        stats = runner.stats
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`), stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        client.close()
+    
+    if not args.pipe:
+        print(colored(f"Batch finished: {stats['ok']} answered, {stats['failed']} failed", "green"), file=sys.stderr)
+
+def run_daemon(config):
+    path = os.path.expanduser(config.get("daemon_socket") or DAEMON_SOCKET)
+    if not hasattr(socketserver, "UnixStreamServer"):
+        print(colored("The daemon needs Unix domain sockets, which this platform lacks.", "red"), file=sys.stderr)
+        sys.exit(1)
+    try:
+        daemon = Daemon(config, path)
+    except OSError as e:
+        print(colored(f"Cannot start the daemon: {str(e)}", "red"), file=sys.stderr)
+        sys.exit(1)
+    
+    print(colored(f"Listening on {path}", "green"), file=sys.stderr)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+        HTTPClient.shared().close()
+
+def ask_daemon(args, config):
+    """Answer --prompt through the daemon, returns the exit status or None if it is not running"""
+    path = os.path.expanduser(config.get("daemon_socket") or DAEMON_SOCKET)
+    request = {"prompt": args.prompt, "page": args.page, "count": args.results, "response_filter": args.response_filter}
+    
+    def on_token(token):
+        sys.stdout.write(token)
+        sys.stdout.flush()
+    
+    reply = daemon_request(request, path, on_token if args.stream else None)
+    if reply is None:
+        return None
+    print("" if args.stream else reply.get("answer", ""))
+    if reply.get("error"):
+        print(f"Error: {reply['error']}", file=sys.stderr)
+        return 1
+    return 0
+
 def main():
     config = Config()
-    history = History(max_items=config.get("max_history", 100))
-    
-    display_banner(config.get("theme", "default"))
+    metrics = Metrics.shared(config)
     
     parser = argparse.ArgumentParser(description="You.com Scraper - Interactive Chat Mode")
     parser.add_argument("-p", "--prompt", help="Initial prompt", type=str, default=None)
     parser.add_argument("-pa", "--page", help="Number of the pages", type=int, default=1)
     parser.add_argument("-r", "--results", help="Results count", type=int, default=1)
+    parser.add_argument("--pages", help="Fetch pages 1..N of the prompt concurrently and merge them", type=int, default=1)
+    parser.add_argument("--max-results", help="Stop fetching pages once this many unique sources are collected", type=int, default=None)
+    parser.add_argument("--response-filter", help=f"Result kinds requested besides the chat text, empty for chat only (default: {RESPONSE_FILTER})", default=None)
+    parser.add_argument("-q", "--quiet", help="Skip the banner and interactive setup, exit after --prompt", action="store_true")
+    parser.add_argument("--continue", dest="resume", help="Continue the last conversation: its latest turns are sent as context", action="store_true")
+    parser.add_argument("--no-stream", dest="stream", help="Wait for the whole answer instead of printing tokens live", action="store_false", default=config.get("stream", True))
+    parser.add_argument("--search", help="Search past prompts and answers, then exit", metavar="TERMS", default=None)
+    parser.add_argument("--search-page", help="Result page for --search", type=int, default=1)
+    parser.add_argument("--batch", help="Answer every prompt of a file (or - for stdin) and write JSON lines", metavar="FILE", default=None)
+    parser.add_argument("--pipe", help="Headless mode: read prompts from stdin, write JSON lines with sources and timings to stdout", action="store_true")
+    parser.add_argument("--concurrency", help="Concurrent requests in batch mode", type=int, default=8)
+    parser.add_argument("--rate", help="Maximum requests per second in batch mode (0 = unlimited)", type=float, default=0)
+    parser.add_argument("--timeout", help="Per-prompt timeout in seconds in batch mode", type=float, default=60)
+    parser.add_argument("-o", "--output", help="Batch results file (default: stdout)", default=None)
+    parser.add_argument("--daemon", help="Serve prompts over a Unix socket from a warm process", action="store_true")
+    parser.add_argument("--client", help="Send --prompt to the running daemon and stream the answer (answers in-process if none is running)", action="store_true")
+    parser.add_argument("--stop-daemon", help="Ask the running daemon to exit", action="store_true")
     args = parser.parse_args()
     
-    command_system = CommandSystem(config, history)
+    if args.client and args.prompt:
+        status = ask_daemon(args, config)
+        if status is not None:
+            sys.exit(status)
+        args.quiet = True
+    
+    if args.stop_daemon:
+        path = os.path.expanduser(config.get("daemon_socket") or DAEMON_SOCKET)
+        sys.exit(0 if daemon_request({"op": "shutdown"}, path) else 1)
+    
+    if args.daemon:
+        run_daemon(config)
+        return
+    
+    if args.batch or args.pipe:
+        run_batch(args, config)
+        return
+    
+    history = History(max_items=config.get("max_history", 100), archive=config.get("archive_history", True))
+    search = SearchIndex()
+    history.subscribe(search.add)
+    
+    if args.search:
+        print(CommandSystem(config, history, search=search).search_history(args.search.split() + ["--page", str(args.search_page)]))
+        return
+    
+    # A single one-shot request does not need requests and its pool
+    HTTPClient.shared(config, light=args.quiet and bool(args.prompt) and args.pages == 1)
+    ResultFormatter.shared(config)
+    cache = ResponseCache.from_config(config) if config.get("cache_enabled", True) else None
+    
+    # One-shot prompts are stateless unless they continue the last conversation
+    context = None
+    if config.get("chat_context", True) and (args.resume or not args.quiet):
+        context = ChatContext.from_config(config)
+        if args.resume:
+            context.seed(history.get(context.max_turns))
+        history.subscribe(context.add)
+    
+    answer = ask_pages if args.pages > 1 else ask
+    
+    if args.quiet and args.prompt:
+        if args.pages > 1:
+            sys.exit(0 if ask_pages(args.prompt, args, config, history, cache, context) else 1)
+        you = ask(args.prompt, args, config, history, cache, context)
+        sys.exit(1 if you.error else 0)
+    
+    if not args.quiet:
+        display_banner(config.get("theme", "default"))
+    
+    command_system = CommandSystem(config, history, cache, search, metrics, context)
     
     if config.get("auto_completion", True):
-        AutoCompleter(command_system.commands, history)
+        AutoCompleter(command_system.commands, history, config.get("completion_mode", "prefix"))
     
     if args.prompt:
-        you = YOU(args.prompt, args.page, args.results, config.get("theme", "default"))
-        answer = you.GenerateAnswer()
-        print(colored("\n🤖 YOU.COM:", "cyan"))
-        print(answer)
-        history.add(args.prompt, answer)
+        answer(args.prompt, args, config, history, cache, context)
     
     try:
         while True:
@@ -568,12 +3446,7 @@ def main():
                     print(result)
                     continue
                 
-                you = YOU(user_input, args.page, args.results, config.get("theme", "default"))
-                answer = you.GenerateAnswer()
-                
-                print(colored("\n🤖 YOU.COM:", "cyan"))
-                print(answer)
-                history.add(user_input, answer)
+                answer(user_input, args, config, history, cache, context)
                 
             except KeyboardInterrupt:
                 print(colored("\n\nOperation cancelled. Try again or press Ctrl+C to exit.", "yellow"))